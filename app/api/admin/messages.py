@@ -1,21 +1,27 @@
 # app/api/admin/messages.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
-from app.db.models import NormalizedMessage, UserPlatformAccount
-from sqlalchemy import select
-from app.db.session import async_session
+from typing import List, Optional
+from app.core.jsonlib import FastJSONResponse
+from app.db.models import NormalizedMessage
+from sqlalchemy import select, func, and_, or_
+from app.db.session import async_session, read_session, note_write
 from app.connectors.telegram.sender import send_message  # existing send helper
+from app.services.account_cache import get_account_for_chat
+from app.services.hot_threads import mark_viewing, record_reply
 
-router = APIRouter(prefix="/admin/messages", tags=["admin"])
+router = APIRouter(prefix="/admin/messages", tags=["admin"], default_response_class=FastJSONResponse)
+
+# read-your-writes scope for admin listing reads (see app.db.session.note_write)
+_READ_SCOPE = "admin:messages"
 
 class ReplyIn(BaseModel):
     text: str
     send_auto: bool = False  # future use (auto reply)
 
 @router.get("/", response_model=List[dict])
-async def list_pending(limit: int = 50):
-    async with async_session() as session:
+async def list_pending(limit: int = 50, force_primary: bool = False):
+    async with read_session(scope=_READ_SCOPE, force_primary=force_primary) as session:
         q = await session.execute(
             select(NormalizedMessage).where(NormalizedMessage.status == "pending").order_by(NormalizedMessage.created_at.desc()).limit(limit)
         )
@@ -31,6 +37,59 @@ async def list_pending(limit: int = 50):
             for r in rows
         ]
 
+@router.get("/search")
+async def search_messages(
+    q: Optional[str] = None,
+    sender: Optional[str] = None,
+    platform: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    """
+    Ranked keyword search over message text (websearch syntax) with optional fuzzy
+    sender-name matching. Keyset-paginated: pass back `next_cursor` to continue.
+    """
+    if not q and not sender:
+        raise HTTPException(status_code=400, detail="q or sender required")
+    limit = max(1, min(limit, 200))
+    m = NormalizedMessage
+
+    filters = []
+    if q:
+        tsq = func.websearch_to_tsquery("simple", q)
+        filters.append(m.search_vector.op("@@")(tsq))
+        rank = func.ts_rank(m.search_vector, tsq)
+    if sender:
+        # trigram similarity catches typos; ILIKE catches substrings (both use the trgm index)
+        # user input is matched literally: escape LIKE wildcards
+        literal = sender.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        filters.append(or_(m.sender_name.op("%")(sender), m.sender_name.ilike(f"%{literal}%", escape="\\")))
+        if not q:
+            rank = func.similarity(m.sender_name, sender)
+    if platform:
+        filters.append(m.platform == platform)
+    if cursor:
+        try:
+            last_rank, last_id = cursor.rsplit(":", 1)
+            last_rank, last_id = float(last_rank), int(last_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        filters.append(or_(rank < last_rank, and_(rank == last_rank, m.id < last_id)))
+
+    stmt = (
+        select(m.id, m.platform, m.platform_thread_id, m.sender_id, m.sender_name, m.text, m.created_at, rank.label("rank"))
+        .where(*filters)
+        .order_by(rank.desc(), m.id.desc())
+        .limit(limit)
+    )
+    async with read_session(scope=_READ_SCOPE) as session:
+        rows = (await session.execute(stmt)).all()
+
+    items = [dict(r._mapping) for r in rows]
+    next_cursor = f"{rows[-1].rank!r}:{rows[-1].id}" if len(rows) == limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @router.post("/{message_id}/reply")
 async def reply_message(message_id: int, body: ReplyIn):
     # fetch record and send via telegram sender
@@ -39,14 +98,13 @@ async def reply_message(message_id: int, body: ReplyIn):
         if not nm:
             raise HTTPException(status_code=404, detail="message not found")
         # find platform_chat_id from user_platform_accounts (if linked)
-        q = await session.execute(select(UserPlatformAccount).where(UserPlatformAccount.platform_chat_id == nm.platform_thread_id))
+        up = await get_account_for_chat(nm.platform_thread_id, nm.platform)
         # fall back to platform_user_id if needed
-        up = q.scalars().first()
-        chat_id = up.platform_chat_id if up else nm.platform_thread_id
+        chat_id = up["platform_chat_id"] if up else nm.platform_thread_id
 
         # call existing send function (can be async)
         try:
-            await send_message(chat_id, body.text)  # if send_message is async; adapt if sync
+            await send_message(chat_id, body.text, bot_id=nm.bot_id)  # if send_message is async; adapt if sync
         except Exception as exc:
             raise HTTPException(status_code=500, detail=str(exc))
 
@@ -54,4 +112,13 @@ async def reply_message(message_id: int, body: ReplyIn):
         nm.status = "responded"
         session.add(nm)
         await session.commit()
+        note_write(_READ_SCOPE)
+        await record_reply(nm.platform, nm.platform_thread_id)
         return {"ok": True, "message_id": nm.id, "status": nm.status}
+
+
+@router.post("/threads/{platform}/{thread_id}/viewing")
+async def thread_viewing(platform: str, thread_id: str):
+    """Heartbeat while an agent has the thread open; puts its new messages on the priority lane."""
+    await mark_viewing(platform, thread_id)
+    return {"ok": True}
@@ -2,6 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from app.db.session import async_session
+from app.services.account_cache import get_account_for_user, invalidate_account
 from app.db.models import UserPlatformAccount, VerificationCode, User
 import random, string, datetime
 from sqlalchemy import select
@@ -44,6 +45,14 @@ async def request_link(payload: RequestLinkIn):
     return {"code": code, "instructions": instructions}
 
 
+async def _get_linked_account(session, user_id: int):
+    q = await session.execute(select(UserPlatformAccount).where(
+        UserPlatformAccount.user_id == user_id,
+        UserPlatformAccount.platform == "telegram"
+    ))
+    return q.scalars().first()
+
+
 # --- send message (app -> telegram) ---
 class SendMessageIn(BaseModel):
     user_id: int   # authenticated Nexa user
@@ -54,20 +63,15 @@ async def send_message_route(payload: SendMessageIn):
     """
     Send a message to the user's linked Telegram chat.
     """
-    async with async_session() as session:
-        q = await session.execute(select(UserPlatformAccount).where(
-            UserPlatformAccount.user_id == payload.user_id,
-            UserPlatformAccount.platform == "telegram"
-        ))
-        acct = q.scalars().first()
-        if not acct:
-            raise HTTPException(status_code=404, detail="telegram account not linked")
+    acct = await get_account_for_user(payload.user_id, "telegram")
+    if not acct:
+        raise HTTPException(status_code=404, detail="telegram account not linked")
 
-        # perform send
-        resp = await send_message(acct.platform_chat_id, payload.text)
+    # perform send
+    resp = await send_message(acct["platform_chat_id"], payload.text, bot_id=acct.get("bot_id"))
 
-        # optionally log the outgoing message somewhere (omitted here)
-        return {"ok": True, "telegram_response": resp}
+    # optionally log the outgoing message somewhere (omitted here)
+    return {"ok": True, "telegram_response": resp}
 
 
 # --- unlink / deboard ---
@@ -77,13 +81,11 @@ class UnlinkIn(BaseModel):
 @router.post("/unlink")
 async def unlink(payload: UnlinkIn):
     async with async_session() as session:
-        q = await session.execute(select(UserPlatformAccount).where(
-            UserPlatformAccount.user_id == payload.user_id,
-            UserPlatformAccount.platform == "telegram"
-        ))
-        acct = q.scalars().first()
+        acct = await _get_linked_account(session, payload.user_id)
         if not acct:
             raise HTTPException(status_code=404, detail="not linked")
+        chat_id = acct.platform_chat_id
         await session.delete(acct)
         await session.commit()
+    await invalidate_account("telegram", payload.user_id, [chat_id])
     return {"ok": True, "detail": "telegram unlinked"}
@@ -0,0 +1,44 @@
+# app/connectors/personal.py
+"""
+Personal Telegram accounts bridged by userbot_listener.py (Telethon).
+
+The userbot forwards Telegram-shaped updates tagged with its `account_id`, one
+per request or as a {"updates": [...]} batch, to POST /webhook/personal.
+Message ids are only unique per account, so the stored message id is
+"<account_id>:<message_id>" to keep dedup from merging two accounts' messages.
+"""
+import hmac
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.connectors.registry import Connector, register
+from app.connectors.telegram.webhook import TelegramUpdate, normalize_update
+
+
+class PersonalUpdate(TelegramUpdate):
+    account_id: Optional[str] = None
+
+
+@register
+class PersonalConnector(Connector):
+    platform = "personal"
+    update_model = PersonalUpdate
+
+    async def authenticate(self, request: Request) -> Dict[str, Any]:
+        if settings.userbot_secret and not hmac.compare_digest(
+            request.headers.get("x-userbot-secret", ""), settings.userbot_secret
+        ):
+            raise HTTPException(status_code=401, detail="bad userbot secret")
+        return {}
+
+    def normalize(self, update: PersonalUpdate, raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = normalize_update(update)
+        if fields is None:
+            return None
+        if update.account_id and fields["platform_message_id"]:
+            fields["platform_message_id"] = f"{update.account_id}:{fields['platform_message_id']}"
+        fields["raw_payload"] = raw
+        fields["edit"] = update.message is None
+        return fields
@@ -0,0 +1,116 @@
+# app/connectors/pipeline.py
+"""
+Shared ingest path for every connector: normalize -> intercept -> dedup ->
+persist -> enqueue, done once per batch rather than once per update.
+
+  - dedup: one query per batch on (platform, bot_id, thread, message id), so
+    redelivered webhooks and replayed poller batches are stored once;
+  - persist: a single insert transaction;
+  - backpressure: threads refused by the admission level are stored with
+    ai_skip_reason set and not enqueued (see app/services/backpressure.py);
+  - enqueue: task_outbox rows written in the same transaction as the messages
+    (the relay in app/tasks/outbox_relay.py publishes them), so a committed
+    message is always dispatched even if the broker is down. Routing still
+    sends hot threads to the priority lane. With outbox_enabled off, messages
+    are published directly after commit in one threadpool hop, and removed
+    again if that fails so the caller's error makes the sender redeliver them.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select, tuple_
+
+from app.core.config import settings
+from app.db.models import NormalizedMessage, TaskOutbox
+from app.db.session import async_session
+from app.services.backpressure import admit_for_ai
+from app.tasks.enqueue import DEFAULT_QUEUE, push_thread_messages, route_thread_messages
+
+logger = logging.getLogger("nexa.connectors.pipeline")
+
+
+async def ingest(connector, updates: List[Tuple[Any, Dict[str, Any]]], ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Run parsed (update, raw) pairs from `connector` through the shared pipeline."""
+    items = []
+    for update, raw in updates:
+        fields = connector.normalize(update, raw)
+        if fields:
+            items.append(fields)
+    kept = await connector.intercept(items, ctx) if items else items
+    ids = await store_messages(connector.platform, kept, bot_id=ctx.get("bot_id"), queue=ctx.get("queue"))
+    return {
+        "ok": True,
+        "received": len(updates),
+        "intercepted": len(items) - len(kept),
+        "stored_ids": ids,
+    }
+
+
+async def store_messages(
+    platform: str,
+    items: List[Dict[str, Any]],
+    bot_id: Optional[int] = None,
+    queue: Optional[str] = None,
+) -> List[int]:
+    """Persist normalized items in one transaction and enqueue the admitted ones. Returns new ids."""
+    if not items:
+        return []
+    for f in items:
+        f["platform_thread_id"] = f.get("platform_thread_id") or "unknown"
+        f["platform_message_id"] = f.get("platform_message_id") or "unknown"
+
+    # edits reuse the original message id, so only new messages take part in dedup
+    keys = [None if f.get("edit") else (f["platform_thread_id"], f["platform_message_id"]) for f in items]
+    level, admitted = await admit_for_ai(platform, {f["platform_thread_id"] for f in items})
+
+    async with async_session() as session:
+        seen = set()
+        if any(keys):
+            q = await session.execute(select(
+                NormalizedMessage.platform_thread_id, NormalizedMessage.platform_message_id
+            ).where(
+                NormalizedMessage.platform == platform,
+                NormalizedMessage.bot_id == bot_id,
+                tuple_(NormalizedMessage.platform_thread_id, NormalizedMessage.platform_message_id).in_([k for k in keys if k]),
+            ))
+            seen = {tuple(r) for r in q.all()}
+        rows = []
+        for key, f in zip(keys, items):
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            rows.append(NormalizedMessage(
+                platform=platform,
+                platform_thread_id=f["platform_thread_id"],
+                platform_message_id=f["platform_message_id"],
+                sender_id=f.get("sender_id"),
+                sender_name=f.get("sender_name"),
+                text=f.get("text"),
+                raw_payload=f.get("raw_payload"),
+                bot_id=bot_id,
+                ai_skip_reason=None if f["platform_thread_id"] in admitted else level,
+            ))
+        session.add_all(rows)
+        await session.flush()
+        to_enqueue = [(nm.id, nm.platform_thread_id) for nm in rows if nm.ai_skip_reason is None]
+        if settings.outbox_enabled and to_enqueue:
+            routed = await route_thread_messages(platform, to_enqueue, queue=queue or DEFAULT_QUEUE)
+            session.add_all([TaskOutbox(message_id=mid, queue=q) for mid, q in routed])
+        await session.commit()
+
+    if to_enqueue and not settings.outbox_enabled:
+        try:
+            await push_thread_messages(platform, to_enqueue, queue=queue or DEFAULT_QUEUE)
+        except Exception:
+            # without the outbox a row only counts as ingested once its task is published;
+            # drop the unpublished rows so the sender's redelivery is stored and published
+            # again rather than deduplicated away
+            async with async_session() as session:
+                await session.execute(delete(NormalizedMessage).where(
+                    NormalizedMessage.id.in_([mid for mid, _ in to_enqueue])
+                ))
+                await session.commit()
+            raise
+    logger.info("Stored %d/%d %s messages bot=%s (%d enqueued)", len(rows), len(items), platform, bot_id, len(to_enqueue))
+    return [nm.id for nm in rows]
@@ -0,0 +1,107 @@
+# app/connectors/registry.py
+"""
+Pluggable platform connectors behind POST /webhook/{platform}.
+
+A connector only knows its platform's payload: it validates it, checks the
+caller's credentials and flattens each update into NormalizedMessage fields.
+Dedup, persistence, backpressure and enqueueing are shared
+(app/connectors/pipeline.py).
+
+Connectors register at import time with @register. The TypeAdapter for a
+connector's update model is built once at registration, so a request costs
+one dict lookup plus one validation call however many platforms exist.
+"""
+import importlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+
+logger = logging.getLogger("nexa.connectors")
+
+# modules imported by load_connectors(); each registers its connector(s) on import
+BUILTIN_CONNECTORS = (
+    "app.connectors.telegram.webhook",
+    "app.connectors.personal",
+)
+
+_registry: Dict[str, "Connector"] = {}
+
+
+class Connector:
+    """
+    Base class for a platform connector. Subclasses set `platform` and
+    `update_model` (a Pydantic model for one update) and implement normalize().
+    """
+
+    platform: str = ""
+    update_model: Any = None
+    # whether the sender retries a 429; if not, backpressure stores instead of rejecting
+    redelivers_on_429: bool = True
+
+    def __init__(self):
+        self._adapter = TypeAdapter(self.update_model)
+
+    def parse(self, body: Any) -> List[Tuple[Any, Dict[str, Any]]]:
+        """
+        Validate a request body into (update, raw dict) pairs. Accepts one update
+        or a {"updates": [...]} envelope from batching bridges. In an envelope an
+        invalid update is logged and dropped so it cannot block its batch; a
+        single invalid update is a 422.
+        """
+        if isinstance(body, dict) and isinstance(body.get("updates"), list):
+            parsed = []
+            for raw in body["updates"]:
+                try:
+                    parsed.append((self._adapter.validate_python(raw), raw))
+                except ValidationError as exc:
+                    logger.warning("Dropping invalid %s update: %s", self.platform, exc.errors()[:3])
+            return parsed
+        try:
+            return [(self._adapter.validate_python(body), body)]
+        except ValidationError as exc:
+            raise HTTPException(status_code=422, detail=exc.errors())
+
+    async def authenticate(self, request: Request) -> Dict[str, Any]:
+        """
+        Check the request's credentials; raise HTTPException to refuse it.
+        Returns the pipeline context: `bot_id` and `queue` for stored messages,
+        plus anything intercept() needs.
+        """
+        return {}
+
+    def normalize(self, update: Any, raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Flatten one update into NormalizedMessage fields (platform_thread_id,
+        platform_message_id, sender_id, sender_name, text, raw_payload) plus
+        `edit`: True for edits, which reuse a message id and so skip dedup.
+        None for updates that carry no message.
+        """
+        raise NotImplementedError
+
+    async def intercept(self, items: List[Dict[str, Any]], ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Consume control messages (e.g. account-linking codes) before storage; returns the rest."""
+        return items
+
+
+def register(cls):
+    """Class decorator: instantiate the connector and make it reachable under its platform name."""
+    connector = cls()
+    if connector.platform in _registry:
+        logger.warning("Connector for %s replaced by %s", connector.platform, cls.__name__)
+    _registry[connector.platform] = connector
+    return cls
+
+
+def get_connector(platform: str) -> Optional[Connector]:
+    return _registry.get(platform)
+
+
+def platforms() -> List[str]:
+    return sorted(_registry)
+
+
+def load_connectors(modules=BUILTIN_CONNECTORS) -> None:
+    for name in modules:
+        importlib.import_module(name)
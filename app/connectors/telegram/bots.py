@@ -0,0 +1,61 @@
+# app/connectors/telegram/bots.py
+"""
+Registry of Telegram bots served by this deployment.
+
+Bots live in the `telegram_bots` table; bot_id None means the legacy single bot
+configured through settings.telegram_bot_token. Lookups are cached in-process
+for `telegram_bot_cache_ttl_seconds` because they sit on the webhook hot path.
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.db.models import TelegramBot
+from app.db.session import read_session
+
+# bot_id -> (expires_at monotonic, bot dict or None)
+_cache: Dict[int, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+
+def default_bot() -> Dict[str, Any]:
+    return {
+        "id": None,
+        "name": "default",
+        "token": settings.telegram_bot_token,
+        "webhook_secret": None,
+        "celery_queue": None,
+        "rate_limit_per_sec": settings.telegram_bot_rate_per_sec,
+    }
+
+
+async def get_bot(bot_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Return the active bot as a plain dict, or None if unknown/inactive."""
+    if bot_id is None:
+        return default_bot()
+
+    now = time.monotonic()
+    hit = _cache.get(bot_id)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+
+    # primary: a bot registered moments ago may not have reached the replica yet, and the
+    # miss would then be cached, 404ing its webhook for a full TTL
+    async with read_session(force_primary=True) as session:
+        row = await session.get(TelegramBot, bot_id)
+    bot = None
+    if row is not None and row.active:
+        bot = {
+            "id": row.id,
+            "name": row.name,
+            "token": row.token,
+            "webhook_secret": row.webhook_secret,
+            "celery_queue": row.celery_queue,
+            "rate_limit_per_sec": row.rate_limit_per_sec or settings.telegram_bot_rate_per_sec,
+        }
+    _cache[bot_id] = (now + settings.telegram_bot_cache_ttl_seconds, bot)
+    return bot
+
+
+def forget_bot(bot_id: int) -> None:
+    """Drop a cached bot after its row changed (token rotation, deactivation)."""
+    _cache.pop(bot_id, None)
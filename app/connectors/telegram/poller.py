@@ -0,0 +1,104 @@
+# app/connectors/telegram/poller.py
+"""
+Long-polling ingest for environments without a public webhook URL.
+
+    python -m app.connectors.telegram.poller [--bot-id 3] [--delete-webhook]
+
+Pulls updates with getUpdates and feeds each batch (up to `telegram_poll_limit`)
+into the same normalization/persistence path as the webhook
+(webhook.handle_updates_batch). The next offset is checkpointed in Redis only
+after a batch is stored and enqueued, so a crash redelivers at most one batch,
+and handle_updates_batch skips messages that were already stored.
+
+scripts/fake_bot_api.py runs this loop against a local fake Bot API to check
+offset checkpointing, poison updates and redelivery after a crash.
+"""
+import argparse
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.jsonlib import loads
+from app.core.redis_client import get_redis
+from app.connectors.telegram.bots import get_bot
+from app.connectors.telegram.sender import TELEGRAM_BASE
+from app.connectors.telegram.webhook import handle_updates_batch
+
+logger = logging.getLogger("nexa.telegram.poller")
+
+_MAX_BACKOFF = 30.0
+
+
+def _offset_key(bot_id: Optional[int]) -> str:
+    return f"nexa:tg:offset:{bot_id if bot_id is not None else 'default'}"
+
+
+async def load_offset(bot_id: Optional[int]) -> Optional[int]:
+    raw = await get_redis().get(_offset_key(bot_id))
+    return int(raw) if raw is not None else None
+
+
+async def save_offset(bot_id: Optional[int], offset: int) -> None:
+    await get_redis().set(_offset_key(bot_id), offset)
+
+
+async def poll(bot_id: Optional[int] = None, delete_webhook: bool = False, stop: Optional[asyncio.Event] = None):
+    """Run the getUpdates loop for one bot until `stop` is set."""
+    bot = await get_bot(bot_id)
+    if bot is None or not bot["token"]:
+        raise SystemExit(f"unknown bot or missing token (bot_id={bot_id})")
+    stop = stop or asyncio.Event()
+    api = f"{TELEGRAM_BASE}/bot{bot['token']}"
+    offset = await load_offset(bot_id)
+    backoff = 1.0
+    logger.info("Polling updates for bot=%s from offset=%s", bot["name"], offset)
+
+    # the long-poll holds the request open for `telegram_poll_timeout`; allow headroom
+    async with httpx.AsyncClient(timeout=settings.telegram_poll_timeout + 10) as client:
+        if delete_webhook:
+            resp = await client.post(f"{api}/deleteWebhook")
+            resp.raise_for_status()
+            logger.info("Webhook removed for bot=%s", bot["name"])
+
+        while not stop.is_set():
+            params = {
+                "timeout": settings.telegram_poll_timeout,
+                "limit": settings.telegram_poll_limit,
+                "allowed_updates": ["message", "edited_message"],
+            }
+            if offset is not None:
+                params["offset"] = offset
+            try:
+                resp = await client.post(f"{api}/getUpdates", json=params)
+                if resp.status_code == 409:
+                    logger.error("getUpdates conflicts with an active webhook for bot=%s; rerun with --delete-webhook", bot["name"])
+                    return
+                resp.raise_for_status()
+                updates = loads(resp.content).get("result", [])
+                if updates:
+                    await handle_updates_batch(updates, bot)
+                    next_offset = updates[-1]["update_id"] + 1
+                    await save_offset(bot_id, next_offset)
+                    # only a checkpointed batch is confirmed to Telegram by the next getUpdates
+                    offset = next_offset
+                backoff = 1.0
+            except Exception as exc:
+                # nothing past the last checkpoint is acknowledged, so the same batch is refetched
+                logger.warning("Polling failed for bot=%s: %s — retrying in %.1fs", bot["name"], exc, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, _MAX_BACKOFF)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Telegram getUpdates ingest runner")
+    parser.add_argument("--bot-id", type=int, default=None, help="telegram_bots id (default: TELEGRAM_BOT_TOKEN)")
+    parser.add_argument("--delete-webhook", action="store_true", help="remove the bot's webhook before polling")
+    args = parser.parse_args()
+    try:
+        asyncio.run(poll(args.bot_id, args.delete_webhook))
+    except KeyboardInterrupt:
+        logger.info("Exiting poller.")
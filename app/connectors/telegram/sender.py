@@ -1,18 +1,81 @@
 # app/connectors/telegram/sender.py
+import asyncio
+import time
+import weakref
 import httpx
 from app.core.config import settings
-from typing import Any
+from app.connectors.telegram.bots import get_bot
+from typing import Any, Dict, Optional
 
-TELEGRAM_BASE = "https://api.telegram.org"
+TELEGRAM_BASE = settings.telegram_api_base.rstrip("/")
 
-async def send_message(chat_id: str | int, text: str) -> dict[str, Any]:
+
+class _RateBudget:
+    """
+    Per-bot outbound budget: hands out evenly spaced send slots at `rate` per second.
+    Slot reservation has no await in it, so it is safe without a lock on one loop.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# Clients are bound to the event loop that created them (Celery runs each task on a
+# fresh loop), so pools are kept per loop and per bot.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_budgets: Dict[Any, _RateBudget] = {}
+
+
+def _client_for(bot_key: Any) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    per_loop = _clients.setdefault(loop, {})
+    client = per_loop.get(bot_key)
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=settings.telegram_bot_max_connections,
+            max_keepalive_connections=settings.telegram_bot_max_connections,
+        )
+        client = httpx.AsyncClient(timeout=20.0, limits=limits)
+        per_loop[bot_key] = client
+    return client
+
+
+def _budget_for(bot_key: Any, rate: Optional[float]) -> _RateBudget:
+    rate = rate or settings.telegram_bot_rate_per_sec
+    budget = _budgets.get(bot_key)
+    # the bot dict is re-read every telegram_bot_cache_ttl_seconds (or after forget_bot),
+    # so a changed rate_limit_per_sec replaces the live budget without a restart
+    if budget is None or budget.rate != rate:
+        budget = _RateBudget(rate)
+        _budgets[bot_key] = budget
+    return budget
+
+
+async def send_message(chat_id: str | int, text: str, bot_id: Optional[int] = None) -> dict[str, Any]:
     """
-    Send a message using your bot token. Returns Telegram API response JSON.
+    Send a message as the given bot (None = settings.telegram_bot_token).
+    Each bot has its own connection pool and rate budget so one busy bot cannot
+    starve the others. Returns Telegram API response JSON.
     """
-    bot_token = settings.telegram_bot_token  # add this to your .env and settings
-    url = f"{TELEGRAM_BASE}/bot{bot_token}/sendMessage"
+    bot = await get_bot(bot_id)
+    if bot is None:
+        raise ValueError(f"unknown or inactive telegram bot id={bot_id}")
+    bot_key = bot["id"] if bot["id"] is not None else "default"
+
+    url = f"{TELEGRAM_BASE}/bot{bot['token']}/sendMessage"
     payload = {"chat_id": str(chat_id), "text": text}
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        resp = await client.post(url, json=payload)
-        resp.raise_for_status()
-        return resp.json()
+    await _budget_for(bot_key, bot["rate_limit_per_sec"]).acquire()
+    resp = await _client_for(bot_key).post(url, json=payload)
+    resp.raise_for_status()
+    return resp.json()
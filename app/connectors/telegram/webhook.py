@@ -1,134 +1,254 @@
 # app/connectors/telegram/webhook.py
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, Request, Header, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+import hmac
 import logging
-from app.db.models import NormalizedMessage
+from app.core.jsonlib import FastJSONResponse, loads
 from app.db.session import async_session
-from app.tasks.enqueue import push_message_to_queue
-router = APIRouter(prefix="/connectors/telegram", tags=["connectors"])
+from app.tasks.enqueue import queue_for_bot
+from app.connectors.telegram.bots import get_bot
+from app.connectors.registry import Connector, get_connector, register
+from app.connectors.pipeline import ingest
+router = APIRouter(prefix="/connectors/telegram", tags=["connectors"], default_response_class=FastJSONResponse)
 logger = logging.getLogger("nexa.telegram")
 
 
-# minimal Pydantic model that tolerates common Telegram fields
+# minimal Pydantic v2 models that tolerate common Telegram fields: every field
+# is optional with a default and unknown fields are ignored
 class FromUser(BaseModel):
-    id: Optional[int]
-    is_bot: Optional[bool]
-    first_name: Optional[str]
-    last_name: Optional[str]
-    username: Optional[str]
+    id: Optional[int] = None
+    is_bot: Optional[bool] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    username: Optional[str] = None
 
 
 class Chat(BaseModel):
-    id: Optional[int]
-    type: Optional[str]
+    id: Optional[int] = None
+    type: Optional[str] = None
 
 
 class Message(BaseModel):
-    message_id: Optional[int]
-    from_: Optional[FromUser] = None
+    # 'from' is a keyword, so the field is from_ with an alias for the incoming JSON
+    model_config = ConfigDict(populate_by_name=True)
+
+    message_id: Optional[int] = None
+    from_: Optional[FromUser] = Field(default=None, alias="from")
     chat: Optional[Chat] = None
     text: Optional[str] = None
     caption: Optional[str] = None
 
-    # alias for 'from' field in incoming JSON
-    class Config:
-        fields = {"from_": "from"}
-
 
 class TelegramUpdate(BaseModel):
-    update_id: Optional[int]
+    update_id: Optional[int] = None
     message: Optional[Message] = None
     edited_message: Optional[Message] = None
 
 
 @router.post("/webhook")
-async def telegram_webhook(payload: TelegramUpdate, x_telegram_bot: Optional[str] = Header(None)):
+async def telegram_webhook(request: Request):
     """
     Async handler that accepts the Telegram update and normalizes it.
-    Using Pydantic keeps validation but is tolerant to missing fields.
+    Legacy single-bot route: uses settings.telegram_bot_token.
+    The body is parsed with orjson and validated once by the connector's TypeAdapter
+    (FastAPI's body handling would decode, validate and re-serialize it again).
+    """
+    return FastJSONResponse(await handle_update(await _json_body(request), await get_bot(None)))
+
+
+@router.post("/{bot_id}/webhook")
+async def telegram_bot_webhook(
+    bot_id: int,
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None),
+):
+    """
+    Per-bot webhook for bots registered in `telegram_bots`.
+    Telegram echoes the secret_token given to setWebhook in X-Telegram-Bot-Api-Secret-Token.
     """
-    body = payload.dict()
+    bot = await _authenticated_bot(bot_id, x_telegram_bot_api_secret_token)
+    return FastJSONResponse(await handle_update(await _json_body(request), bot))
+
+
+async def _json_body(request: Request) -> Any:
+    try:
+        return loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid JSON body")
+
+
+async def _authenticated_bot(bot_id: Optional[int], secret: Optional[str]) -> Dict[str, Any]:
+    bot = await get_bot(bot_id)
+    if bot is None:
+        raise HTTPException(status_code=404, detail="unknown bot")
+    if bot["webhook_secret"] and not hmac.compare_digest(secret or "", bot["webhook_secret"]):
+        raise HTTPException(status_code=401, detail="bad secret token")
+    return bot
+
+
+def _context(bot: Dict[str, Any]) -> Dict[str, Any]:
+    return {"bot": bot, "bot_id": bot["id"], "queue": queue_for_bot(bot["id"], bot["celery_queue"])}
+
+
+def normalize_update(payload: TelegramUpdate) -> Optional[Dict[str, Any]]:
+    """Flatten an update into NormalizedMessage fields; None for updates without a message."""
     msg = payload.message or payload.edited_message
     if not msg:
-        logger.info("Telegram update without message received: %s", body)
-        return {"ok": True, "skipped": True}
+        return None
+    return {
+        "platform_thread_id": str(msg.chat.id) if msg.chat and msg.chat.id is not None else None,
+        "platform_message_id": str(msg.message_id) if msg.message_id is not None else None,
+        "sender_id": str(msg.from_.id) if msg.from_ and msg.from_.id is not None else None,
+        "sender_name": msg.from_.first_name if msg.from_ and msg.from_.first_name else None,
+        "text": msg.text or msg.caption or "",
+    }
+
+
+@register
+class TelegramConnector(Connector):
+    """
+    Bot API updates. POST /webhook/telegram serves the legacy single bot;
+    `?bot_id=` selects a bot registered in `telegram_bots`, authenticated by
+    the X-Telegram-Bot-Api-Secret-Token header like /connectors/telegram/{bot_id}/webhook.
+    """
+
+    platform = "telegram"
+    update_model = TelegramUpdate
+    # Telegram backs off its whole webhook on errors, so it is never rejected
+    redelivers_on_429 = False
+
+    async def authenticate(self, request: Request) -> Dict[str, Any]:
+        raw_id = request.query_params.get("bot_id")
+        try:
+            bot_id = int(raw_id) if raw_id else None
+        except ValueError:
+            raise HTTPException(status_code=404, detail="unknown bot")
+        return _context(await _authenticated_bot(bot_id, request.headers.get("x-telegram-bot-api-secret-token")))
+
+    def normalize(self, update: TelegramUpdate, raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = normalize_update(update)
+        if fields is None:
+            return None
+        fields["raw_payload"] = raw
+        fields["edit"] = update.message is None
+        return fields
+
+    async def intercept(self, items: List[Dict[str, Any]], ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Verification flow: a message whose text is an active verification code
+        links the sender's Telegram account instead of being stored. Codes are
+        rare, so one query finds them for the whole batch.
+        """
+        from app.db.models import VerificationCode
+        from sqlalchemy import select
+        import datetime
+
+        candidates = {f["text"].strip() for f in items if f["text"].strip()}
+        if not candidates:
+            return items
+        async with async_session() as session:
+            q = await session.execute(select(VerificationCode.code).where(
+                VerificationCode.code.in_(candidates),
+                VerificationCode.platform == "telegram",
+                VerificationCode.used == False,
+                VerificationCode.expires_at >= datetime.datetime.utcnow()
+            ))
+            codes = set(q.scalars().all())
+        if not codes:
+            return items
+
+        kept = []
+        for f in items:
+            if f["text"].strip() in codes and await _link_account(f, ctx["bot"]):
+                continue
+            kept.append(f)
+        return kept
 
-    # normalize
-    platform_thread_id = str(msg.chat.id) if msg.chat and msg.chat.id is not None else None
-    platform_message_id = str(msg.message_id) if msg.message_id is not None else None
-    sender_id = str(msg.from_.id) if msg.from_ and msg.from_.id is not None else None
-    sender_name = msg.from_.first_name if msg.from_ and msg.from_.first_name else None
-    text = msg.text or msg.caption or ""
 
-    # --- verification flow: if the incoming text matches an active verification code,
-    # link the Telegram account and notify the user via the bot, then stop processing.
+_connector = get_connector("telegram")
+
+
+async def _link_account(fields: Dict[str, Any], bot: Dict[str, Any]) -> bool:
+    """
+    If the text matches an active verification code, link the Telegram account
+    and notify the user via the bot. Returns False when the code is no longer valid.
+    """
     from app.db.models import VerificationCode, UserPlatformAccount
     from sqlalchemy import select
     import datetime
 
+    bot_id = bot["id"]
+    platform_thread_id = fields["platform_thread_id"]
+    sender_id = fields["sender_id"]
+
     async with async_session() as session:
         q = await session.execute(select(VerificationCode).where(
-            VerificationCode.code == text.strip(),
+            VerificationCode.code == fields["text"].strip(),
             VerificationCode.platform == "telegram",
             VerificationCode.used == False,
             VerificationCode.expires_at >= datetime.datetime.utcnow()
         ))
         vc = q.scalars().first()
-        if vc:
-            # link account: create or update UserPlatformAccount for this user
-            existing_q = await session.execute(select(UserPlatformAccount).where(
-                UserPlatformAccount.user_id == vc.user_id,
-                UserPlatformAccount.platform == "telegram"
-            ))
-            existing = existing_q.scalars().first()
-            if existing:
-                existing.platform_user_id = sender_id
-                existing.platform_chat_id = platform_thread_id
-                existing.credentials = existing.credentials or {}
-                session.add(existing)
-            else:
-                new = UserPlatformAccount(
-                    user_id=vc.user_id,
-                    platform="telegram",
-                    platform_user_id=sender_id,
-                    platform_chat_id=platform_thread_id,
-                    credentials={}
-                )
-                session.add(new)
-
-            # mark verification code used
-            vc.used = True
-            session.add(vc)
-            await session.commit()
-            await session.refresh(new if not existing else existing)
-
-            # notify the user (bot replies)
-            try:
-                from app.connectors.telegram.sender import send_message as bot_send
-                await bot_send(platform_thread_id, f"NEXA: Your account has been linked. You can now receive replies from Nexa.")
-            except Exception:
-                pass
-
-            return {"ok": True, "linked": True}
-
-    # persist
-    async with async_session() as session:
-        nm = NormalizedMessage(
-            platform="telegram",
-            platform_thread_id=platform_thread_id or "unknown",
-            platform_message_id=platform_message_id or "unknown",
-            sender_id=sender_id,
-            sender_name=sender_name,
-            text=text,
-            raw_payload=body,
-        )
-        session.add(nm)
+        if not vc:
+            return False
+        # link account: create or update UserPlatformAccount for this user
+        existing_q = await session.execute(select(UserPlatformAccount).where(
+            UserPlatformAccount.user_id == vc.user_id,
+            UserPlatformAccount.platform == "telegram"
+        ))
+        existing = existing_q.scalars().first()
+        previous_chat_id = existing.platform_chat_id if existing else None
+        if existing:
+            existing.platform_user_id = sender_id
+            existing.platform_chat_id = platform_thread_id
+            existing.credentials = existing.credentials or {}
+            existing.bot_id = bot_id
+            session.add(existing)
+        else:
+            new = UserPlatformAccount(
+                user_id=vc.user_id,
+                platform="telegram",
+                platform_user_id=sender_id,
+                platform_chat_id=platform_thread_id,
+                credentials={},
+                bot_id=bot_id,
+            )
+            session.add(new)
+
+        # mark verification code used
+        vc.used = True
+        session.add(vc)
         await session.commit()
-        await session.refresh(nm)
+        from app.services.account_cache import invalidate_account
+        await invalidate_account("telegram", vc.user_id, [previous_chat_id, platform_thread_id])
+
+    # notify the user (bot replies)
+    try:
+        from app.connectors.telegram.sender import send_message as bot_send
+        await bot_send(platform_thread_id, f"NEXA: Your account has been linked. You can now receive replies from Nexa.", bot_id=bot_id)
+    except Exception:
+        pass
+    return True
+
+
+async def handle_update(raw: Dict[str, Any], bot: Dict[str, Any]):
+    """Validate, normalize, link-or-persist and enqueue one raw update received by `bot`."""
+    result = await ingest(_connector, _connector.parse(raw), _context(bot))
+    if result["intercepted"]:
+        return {"ok": True, "linked": True}
+    if not result["stored_ids"]:
+        # no message in the update, or a redelivery of one already stored
+        return {"ok": True, "skipped": True}
+    return {"ok": True, "stored_id": result["stored_ids"][0]}
 
-    # enqueue background processing (async helper inside)
-    await push_message_to_queue(nm.id)
 
-    logger.info("Stored Telegram message id=%s from=%s", nm.id, sender_name)
-    return {"ok": True, "stored_id": nm.id}
+async def handle_updates_batch(raws: List[Dict[str, Any]], bot: Dict[str, Any]) -> List[int]:
+    """
+    Batched handle_update for the getUpdates poller. Invalid updates are logged
+    and dropped so they cannot block the offset; messages already stored for
+    this bot (redelivered after a crash before the offset checkpoint) are
+    skipped by the pipeline's dedup. Returns the ids of newly stored messages.
+    """
+    result = await ingest(_connector, _connector.parse({"updates": raws}), _context(bot))
+    return result["stored_ids"]
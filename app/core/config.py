@@ -39,6 +39,75 @@ _DEFAULTS: Dict[str, Any] = {
     "webhook_base_url": None,
     "telegram_webhook_url": None,
     "redis_url": "redis://localhost:6379/0",
+    # async engine / connection pool tuning (see app/db/session.py)
+    "db_pool_size": 10,
+    "db_max_overflow": 20,
+    "db_pool_timeout": 30.0,
+    "db_pool_recycle": 1800,
+    "db_pool_pre_ping": True,
+    "db_pool_use_lifo": True,
+    "db_statement_cache_size": 100,
+    "db_pgbouncer_mode": False,
+    "db_echo": False,
+    # optional read replica (see read_session() in app/db/session.py)
+    "database_replica_url": None,
+    "db_replica_max_lag_seconds": 5.0,
+    "db_replica_lag_check_interval": 2.0,
+    "db_read_your_writes_seconds": 5.0,
+    # account-link lookup cache (see app/services/account_cache.py)
+    "account_cache_ttl_seconds": 300,
+    "account_cache_negative_ttl_seconds": 30,
+    "account_cache_local_ttl_seconds": 5.0,
+    # multi-bot telegram connector (see app/connectors/telegram/bots.py)
+    "telegram_bot_rate_per_sec": 25.0,
+    "telegram_bot_max_connections": 20,
+    "telegram_bot_cache_ttl_seconds": 60.0,
+    "celery_bot_queue_shards": 0,
+    # Bot API endpoint (point at a local fake Bot API for testing) and getUpdates poller
+    "telegram_api_base": "https://api.telegram.org",
+    "telegram_poll_timeout": 50,
+    "telegram_poll_limit": 100,
+    # priority lane for hot threads (see app/services/hot_threads.py)
+    "priority_lane_enabled": False,
+    "priority_lane_view_ttl_seconds": 30,
+    "priority_lane_reply_window_seconds": 600,
+    "priority_lane_min_replies": 3,
+    "priority_lane_max_per_minute": 120,
+    # single-flight coalescing of identical AI calls (see app/services/singleflight.py)
+    "ai_singleflight_enabled": True,
+    "ai_singleflight_lock_ttl_seconds": 120,
+    "ai_singleflight_result_ttl_seconds": 60,
+    "ai_singleflight_wait_seconds": 120.0,
+    # LLM provider endpoint and Batch API mode (see submit_suggestion_batch in app/services/ai_service.py)
+    "openai_api_base": "https://api.openai.com/v1",
+    "ai_batch_queues": "",
+    "ai_batch_max_requests": 5000,
+    "ai_batch_completion_window": "24h",
+    "ai_batch_interval_seconds": 300.0,
+    # AI call deadline, hedging and per-model circuit breaker (see app/services/circuit_breaker.py)
+    "ai_deadline_seconds": 20.0,
+    "ai_hedge_after_seconds": 0.0,
+    "ai_breaker_failure_threshold": 5,
+    "ai_breaker_window_seconds": 60,
+    "ai_breaker_cooldown_seconds": 30,
+    # ingest backpressure thresholds (see app/services/backpressure.py); 0 disables a threshold
+    "backpressure_enabled": True,
+    "backpressure_check_interval_seconds": 5.0,
+    "backpressure_shed_depth": 5000,
+    "backpressure_shed_age_seconds": 120.0,
+    "backpressure_store_only_depth": 20000,
+    "backpressure_store_only_age_seconds": 600.0,
+    "backpressure_reject_depth": 50000,
+    "backpressure_reject_age_seconds": 1800.0,
+    "backpressure_retry_after_seconds": 30,
+    # shared secret the userbot sends in X-USERBOT-SECRET to /webhook/personal (empty = not checked)
+    "userbot_secret": "",
+    # transactional outbox: ingest writes task_outbox rows, the relay publishes them to Celery
+    "outbox_enabled": True,
+    "outbox_batch_size": 500,
+    "outbox_poll_interval_seconds": 0.5,
+    # failed Batch API attempts before a message is given up (ai_skip_reason = batch_failed)
+    "ai_batch_max_attempts": 3,
 }
 
 if _is_pydantic_v2:
@@ -52,6 +121,62 @@ if _is_pydantic_v2:
         "telegram_bot_token": Optional[str],
         "webhook_base_url": Optional[str],
         "telegram_webhook_url": Optional[str],
+        "db_pool_size": int,
+        "db_max_overflow": int,
+        "db_pool_timeout": float,
+        "db_pool_recycle": int,
+        "db_pool_pre_ping": bool,
+        "db_pool_use_lifo": bool,
+        "db_statement_cache_size": int,
+        "db_pgbouncer_mode": bool,
+        "db_echo": bool,
+        "database_replica_url": Optional[str],
+        "db_replica_max_lag_seconds": float,
+        "db_replica_lag_check_interval": float,
+        "db_read_your_writes_seconds": float,
+        "account_cache_ttl_seconds": int,
+        "account_cache_negative_ttl_seconds": int,
+        "account_cache_local_ttl_seconds": float,
+        "telegram_bot_rate_per_sec": float,
+        "telegram_bot_max_connections": int,
+        "telegram_bot_cache_ttl_seconds": float,
+        "celery_bot_queue_shards": int,
+        "telegram_api_base": str,
+        "telegram_poll_timeout": int,
+        "telegram_poll_limit": int,
+        "priority_lane_enabled": bool,
+        "priority_lane_view_ttl_seconds": int,
+        "priority_lane_reply_window_seconds": int,
+        "priority_lane_min_replies": int,
+        "priority_lane_max_per_minute": int,
+        "ai_singleflight_enabled": bool,
+        "ai_singleflight_lock_ttl_seconds": int,
+        "ai_singleflight_result_ttl_seconds": int,
+        "ai_singleflight_wait_seconds": float,
+        "openai_api_base": str,
+        "ai_batch_queues": str,
+        "ai_batch_max_requests": int,
+        "ai_batch_completion_window": str,
+        "ai_batch_interval_seconds": float,
+        "ai_deadline_seconds": float,
+        "ai_hedge_after_seconds": float,
+        "ai_breaker_failure_threshold": int,
+        "ai_breaker_window_seconds": int,
+        "ai_breaker_cooldown_seconds": int,
+        "backpressure_enabled": bool,
+        "backpressure_check_interval_seconds": float,
+        "backpressure_shed_depth": int,
+        "backpressure_shed_age_seconds": float,
+        "backpressure_store_only_depth": int,
+        "backpressure_store_only_age_seconds": float,
+        "backpressure_reject_depth": int,
+        "backpressure_reject_age_seconds": float,
+        "backpressure_retry_after_seconds": int,
+        "userbot_secret": str,
+        "outbox_enabled": bool,
+        "outbox_batch_size": int,
+        "outbox_poll_interval_seconds": float,
+        "ai_batch_max_attempts": int,
     }
     attrs: Dict[str, Any] = {
         "__annotations__": annotations,
@@ -62,6 +187,62 @@ if _is_pydantic_v2:
         "webhook_base_url": _DEFAULTS["webhook_base_url"],
         "telegram_webhook_url": _DEFAULTS["telegram_webhook_url"],
         "redis_url": _DEFAULTS["redis_url"],
+        "db_pool_size": _DEFAULTS["db_pool_size"],
+        "db_max_overflow": _DEFAULTS["db_max_overflow"],
+        "db_pool_timeout": _DEFAULTS["db_pool_timeout"],
+        "db_pool_recycle": _DEFAULTS["db_pool_recycle"],
+        "db_pool_pre_ping": _DEFAULTS["db_pool_pre_ping"],
+        "db_pool_use_lifo": _DEFAULTS["db_pool_use_lifo"],
+        "db_statement_cache_size": _DEFAULTS["db_statement_cache_size"],
+        "db_pgbouncer_mode": _DEFAULTS["db_pgbouncer_mode"],
+        "db_echo": _DEFAULTS["db_echo"],
+        "database_replica_url": _DEFAULTS["database_replica_url"],
+        "db_replica_max_lag_seconds": _DEFAULTS["db_replica_max_lag_seconds"],
+        "db_replica_lag_check_interval": _DEFAULTS["db_replica_lag_check_interval"],
+        "db_read_your_writes_seconds": _DEFAULTS["db_read_your_writes_seconds"],
+        "account_cache_ttl_seconds": _DEFAULTS["account_cache_ttl_seconds"],
+        "account_cache_negative_ttl_seconds": _DEFAULTS["account_cache_negative_ttl_seconds"],
+        "account_cache_local_ttl_seconds": _DEFAULTS["account_cache_local_ttl_seconds"],
+        "telegram_bot_rate_per_sec": _DEFAULTS["telegram_bot_rate_per_sec"],
+        "telegram_bot_max_connections": _DEFAULTS["telegram_bot_max_connections"],
+        "telegram_bot_cache_ttl_seconds": _DEFAULTS["telegram_bot_cache_ttl_seconds"],
+        "celery_bot_queue_shards": _DEFAULTS["celery_bot_queue_shards"],
+        "telegram_api_base": _DEFAULTS["telegram_api_base"],
+        "telegram_poll_timeout": _DEFAULTS["telegram_poll_timeout"],
+        "telegram_poll_limit": _DEFAULTS["telegram_poll_limit"],
+        "priority_lane_enabled": _DEFAULTS["priority_lane_enabled"],
+        "priority_lane_view_ttl_seconds": _DEFAULTS["priority_lane_view_ttl_seconds"],
+        "priority_lane_reply_window_seconds": _DEFAULTS["priority_lane_reply_window_seconds"],
+        "priority_lane_min_replies": _DEFAULTS["priority_lane_min_replies"],
+        "priority_lane_max_per_minute": _DEFAULTS["priority_lane_max_per_minute"],
+        "ai_singleflight_enabled": _DEFAULTS["ai_singleflight_enabled"],
+        "ai_singleflight_lock_ttl_seconds": _DEFAULTS["ai_singleflight_lock_ttl_seconds"],
+        "ai_singleflight_result_ttl_seconds": _DEFAULTS["ai_singleflight_result_ttl_seconds"],
+        "ai_singleflight_wait_seconds": _DEFAULTS["ai_singleflight_wait_seconds"],
+        "openai_api_base": _DEFAULTS["openai_api_base"],
+        "ai_batch_queues": _DEFAULTS["ai_batch_queues"],
+        "ai_batch_max_requests": _DEFAULTS["ai_batch_max_requests"],
+        "ai_batch_completion_window": _DEFAULTS["ai_batch_completion_window"],
+        "ai_batch_interval_seconds": _DEFAULTS["ai_batch_interval_seconds"],
+        "ai_deadline_seconds": _DEFAULTS["ai_deadline_seconds"],
+        "ai_hedge_after_seconds": _DEFAULTS["ai_hedge_after_seconds"],
+        "ai_breaker_failure_threshold": _DEFAULTS["ai_breaker_failure_threshold"],
+        "ai_breaker_window_seconds": _DEFAULTS["ai_breaker_window_seconds"],
+        "ai_breaker_cooldown_seconds": _DEFAULTS["ai_breaker_cooldown_seconds"],
+        "backpressure_enabled": _DEFAULTS["backpressure_enabled"],
+        "backpressure_check_interval_seconds": _DEFAULTS["backpressure_check_interval_seconds"],
+        "backpressure_shed_depth": _DEFAULTS["backpressure_shed_depth"],
+        "backpressure_shed_age_seconds": _DEFAULTS["backpressure_shed_age_seconds"],
+        "backpressure_store_only_depth": _DEFAULTS["backpressure_store_only_depth"],
+        "backpressure_store_only_age_seconds": _DEFAULTS["backpressure_store_only_age_seconds"],
+        "backpressure_reject_depth": _DEFAULTS["backpressure_reject_depth"],
+        "backpressure_reject_age_seconds": _DEFAULTS["backpressure_reject_age_seconds"],
+        "backpressure_retry_after_seconds": _DEFAULTS["backpressure_retry_after_seconds"],
+        "userbot_secret": _DEFAULTS["userbot_secret"],
+        "outbox_enabled": _DEFAULTS["outbox_enabled"],
+        "outbox_batch_size": _DEFAULTS["outbox_batch_size"],
+        "outbox_poll_interval_seconds": _DEFAULTS["outbox_poll_interval_seconds"],
+        "ai_batch_max_attempts": _DEFAULTS["ai_batch_max_attempts"],
         "model_config": {
             "env_file": ".env",
             "env_file_encoding": "utf-8",
@@ -80,6 +261,62 @@ else:
         telegram_bot_token: Optional[str] = _DEFAULTS["telegram_bot_token"]
         webhook_base_url: Optional[str] = _DEFAULTS["webhook_base_url"]
         telegram_webhook_url: Optional[str] = _DEFAULTS["telegram_webhook_url"]
+        db_pool_size: int = _DEFAULTS["db_pool_size"]
+        db_max_overflow: int = _DEFAULTS["db_max_overflow"]
+        db_pool_timeout: float = _DEFAULTS["db_pool_timeout"]
+        db_pool_recycle: int = _DEFAULTS["db_pool_recycle"]
+        db_pool_pre_ping: bool = _DEFAULTS["db_pool_pre_ping"]
+        db_pool_use_lifo: bool = _DEFAULTS["db_pool_use_lifo"]
+        db_statement_cache_size: int = _DEFAULTS["db_statement_cache_size"]
+        db_pgbouncer_mode: bool = _DEFAULTS["db_pgbouncer_mode"]
+        db_echo: bool = _DEFAULTS["db_echo"]
+        database_replica_url: Optional[str] = _DEFAULTS["database_replica_url"]
+        db_replica_max_lag_seconds: float = _DEFAULTS["db_replica_max_lag_seconds"]
+        db_replica_lag_check_interval: float = _DEFAULTS["db_replica_lag_check_interval"]
+        db_read_your_writes_seconds: float = _DEFAULTS["db_read_your_writes_seconds"]
+        account_cache_ttl_seconds: int = _DEFAULTS["account_cache_ttl_seconds"]
+        account_cache_negative_ttl_seconds: int = _DEFAULTS["account_cache_negative_ttl_seconds"]
+        account_cache_local_ttl_seconds: float = _DEFAULTS["account_cache_local_ttl_seconds"]
+        telegram_bot_rate_per_sec: float = _DEFAULTS["telegram_bot_rate_per_sec"]
+        telegram_bot_max_connections: int = _DEFAULTS["telegram_bot_max_connections"]
+        telegram_bot_cache_ttl_seconds: float = _DEFAULTS["telegram_bot_cache_ttl_seconds"]
+        celery_bot_queue_shards: int = _DEFAULTS["celery_bot_queue_shards"]
+        telegram_api_base: str = _DEFAULTS["telegram_api_base"]
+        telegram_poll_timeout: int = _DEFAULTS["telegram_poll_timeout"]
+        telegram_poll_limit: int = _DEFAULTS["telegram_poll_limit"]
+        priority_lane_enabled: bool = _DEFAULTS["priority_lane_enabled"]
+        priority_lane_view_ttl_seconds: int = _DEFAULTS["priority_lane_view_ttl_seconds"]
+        priority_lane_reply_window_seconds: int = _DEFAULTS["priority_lane_reply_window_seconds"]
+        priority_lane_min_replies: int = _DEFAULTS["priority_lane_min_replies"]
+        priority_lane_max_per_minute: int = _DEFAULTS["priority_lane_max_per_minute"]
+        ai_singleflight_enabled: bool = _DEFAULTS["ai_singleflight_enabled"]
+        ai_singleflight_lock_ttl_seconds: int = _DEFAULTS["ai_singleflight_lock_ttl_seconds"]
+        ai_singleflight_result_ttl_seconds: int = _DEFAULTS["ai_singleflight_result_ttl_seconds"]
+        ai_singleflight_wait_seconds: float = _DEFAULTS["ai_singleflight_wait_seconds"]
+        openai_api_base: str = _DEFAULTS["openai_api_base"]
+        ai_batch_queues: str = _DEFAULTS["ai_batch_queues"]
+        ai_batch_max_requests: int = _DEFAULTS["ai_batch_max_requests"]
+        ai_batch_completion_window: str = _DEFAULTS["ai_batch_completion_window"]
+        ai_batch_interval_seconds: float = _DEFAULTS["ai_batch_interval_seconds"]
+        ai_deadline_seconds: float = _DEFAULTS["ai_deadline_seconds"]
+        ai_hedge_after_seconds: float = _DEFAULTS["ai_hedge_after_seconds"]
+        ai_breaker_failure_threshold: int = _DEFAULTS["ai_breaker_failure_threshold"]
+        ai_breaker_window_seconds: int = _DEFAULTS["ai_breaker_window_seconds"]
+        ai_breaker_cooldown_seconds: int = _DEFAULTS["ai_breaker_cooldown_seconds"]
+        backpressure_enabled: bool = _DEFAULTS["backpressure_enabled"]
+        backpressure_check_interval_seconds: float = _DEFAULTS["backpressure_check_interval_seconds"]
+        backpressure_shed_depth: int = _DEFAULTS["backpressure_shed_depth"]
+        backpressure_shed_age_seconds: float = _DEFAULTS["backpressure_shed_age_seconds"]
+        backpressure_store_only_depth: int = _DEFAULTS["backpressure_store_only_depth"]
+        backpressure_store_only_age_seconds: float = _DEFAULTS["backpressure_store_only_age_seconds"]
+        backpressure_reject_depth: int = _DEFAULTS["backpressure_reject_depth"]
+        backpressure_reject_age_seconds: float = _DEFAULTS["backpressure_reject_age_seconds"]
+        backpressure_retry_after_seconds: int = _DEFAULTS["backpressure_retry_after_seconds"]
+        userbot_secret: str = _DEFAULTS["userbot_secret"]
+        outbox_enabled: bool = _DEFAULTS["outbox_enabled"]
+        outbox_batch_size: int = _DEFAULTS["outbox_batch_size"]
+        outbox_poll_interval_seconds: float = _DEFAULTS["outbox_poll_interval_seconds"]
+        ai_batch_max_attempts: int = _DEFAULTS["ai_batch_max_attempts"]
 
         class Config:
             env_file = ".env"
@@ -0,0 +1,24 @@
+# app/core/jsonlib.py
+"""
+JSON for the webhook and API hot paths: orjson when installed, stdlib json otherwise.
+
+orjson parses request bytes without decoding them to str first and serializes
+datetimes natively, so FastJSONResponse skips the stdlib encoder on responses.
+"""
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+
+    loads = orjson.loads
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    import json
+    from fastapi.responses import JSONResponse as FastJSONResponse
+
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=str).encode()
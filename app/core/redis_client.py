@@ -0,0 +1,28 @@
+# app/core/redis_client.py
+import asyncio
+import weakref
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+# One client per event loop: Celery tasks run each job on a fresh loop
+# (see worker_tasks._run_coro_on_new_loop) and redis.asyncio connections are loop-bound.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> aioredis.Redis:
+    """Return the shared async Redis client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = aioredis.from_url(settings.redis_url, decode_responses=True)
+        _clients[loop] = client
+    return client
+
+
+async def close_redis() -> None:
+    """Close the running event loop's client, if it has one; call before the loop is closed."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
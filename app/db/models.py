@@ -2,7 +2,7 @@
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from datetime import datetime
 
 Base = declarative_base()
@@ -13,6 +13,17 @@ class User(Base):
     email = sa.Column(sa.String, unique=True, nullable=True)
     # add more fields as you need
 
+class TelegramBot(Base):
+    __tablename__ = "telegram_bots"
+    id = sa.Column(sa.Integer, primary_key=True, index=True)
+    name = sa.Column(sa.String, nullable=False, unique=True)
+    token = sa.Column(sa.String, nullable=False)
+    webhook_secret = sa.Column(sa.String, nullable=True)            # checked against X-Telegram-Bot-Api-Secret-Token
+    celery_queue = sa.Column(sa.String, nullable=True)              # dedicated queue; default is a hashed shard
+    rate_limit_per_sec = sa.Column(sa.Float, nullable=True)         # outbound send budget; default from settings
+    active = sa.Column(sa.Boolean, default=True, nullable=False)
+    created_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
+
 class UserPlatformAccount(Base):
     __tablename__ = "user_platform_accounts"
     id = sa.Column(sa.Integer, primary_key=True, index=True)
@@ -21,11 +32,17 @@ class UserPlatformAccount(Base):
     platform_user_id = sa.Column(sa.String, nullable=False)       # e.g. telegram user id
     platform_chat_id = sa.Column(sa.String, nullable=True)        # e.g. chat id
     credentials = sa.Column(sa.JSON, nullable=True)               # encrypted token metadata for OAuth platforms
+    bot_id = sa.Column(sa.Integer, sa.ForeignKey("telegram_bots.id", ondelete="SET NULL"), nullable=True)  # bot the link was made through
     created_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
     updated_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now())
 
     user = relationship("User", backref="platform_accounts")
 
+    __table_args__ = (
+        # chat -> account lookups (reply_message, account cache loader)
+        sa.Index("ix_user_platform_accounts_platform_chat", "platform", "platform_chat_id"),
+    )
+
 
 class VerificationCode(Base):
     __tablename__ = "verification_codes"
@@ -50,5 +67,62 @@ class NormalizedMessage(Base, AsyncAttrs):
     sender_name = sa.Column(sa.String, nullable=True)
     text = sa.Column(sa.Text, nullable=True)
     raw_payload = sa.Column(JSONB, nullable=True)
+    bot_id = sa.Column(sa.Integer, sa.ForeignKey("telegram_bots.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = sa.Column(sa.DateTime(timezone=True), default=datetime.utcnow)
     processed = sa.Column(sa.Boolean, default=False, index=True)
+    suggestions = sa.Column(JSONB, nullable=True)  # reply suggestions from the AI service
+    # why AI processing was skipped, if it was: the backpressure level ("shed", "store_only",
+    # "reject") or "batch_failed"; such rows stay processed = false so they can be backfilled
+    ai_skip_reason = sa.Column(sa.String, nullable=True)
+    # full-text search over text; computed by Postgres on insert ('simple' config: no stemming, any language)
+    search_vector = sa.Column(
+        TSVECTOR,
+        sa.Computed("to_tsvector('simple', coalesce(text, ''))", persisted=True),
+    )
+
+    __table_args__ = (
+        # fastupdate batches GIN maintenance into a pending list so inserts stay cheap
+        sa.Index(
+            "ix_normalized_messages_search_vector", "search_vector",
+            postgresql_using="gin", postgresql_with={"fastupdate": "on"},
+        ),
+        # backfill of messages that skipped AI processing
+        sa.Index(
+            "ix_normalized_messages_ai_skipped_created_at", "created_at",
+            postgresql_where=sa.text("ai_skip_reason IS NOT NULL"),
+        ),
+        # fuzzy sender-name matching (requires the pg_trgm extension; see scripts/create_tables.py)
+        sa.Index(
+            "ix_normalized_messages_sender_name_trgm", "sender_name",
+            postgresql_using="gin", postgresql_ops={"sender_name": "gin_trgm_ops"},
+            postgresql_with={"fastupdate": "on"},
+        ),
+    )
+
+
+class AIBatchJob(Base):
+    """A provider Batch API job generating suggestions for a set of messages."""
+    __tablename__ = "ai_batch_jobs"
+
+    id = sa.Column(sa.Integer, primary_key=True, index=True)
+    provider_batch_id = sa.Column(sa.String, nullable=False, unique=True)
+    status = sa.Column(sa.String, nullable=False, default="submitted", index=True)  # provider status, mirrored on poll
+    message_ids = sa.Column(JSONB, nullable=False)
+    output_file_id = sa.Column(sa.String, nullable=True)
+    created_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
+    completed_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+
+
+class TaskOutbox(Base):
+    """
+    Transactional outbox: a process_normalized_message publish owed for a
+    committed message. Rows are inserted in the same transaction as the
+    NormalizedMessage and deleted by the relay (app/tasks/outbox_relay.py)
+    once published to the broker.
+    """
+    __tablename__ = "task_outbox"
+
+    id = sa.Column(sa.BigInteger, primary_key=True)
+    message_id = sa.Column(sa.Integer, sa.ForeignKey("normalized_messages.id", ondelete="CASCADE"), nullable=False)
+    queue = sa.Column(sa.String, nullable=False)
+    created_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
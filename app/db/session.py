@@ -1,6 +1,181 @@
 # app/db/session.py
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from sqlalchemy import exc as sa_exc, text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from ..core.config import settings
 
-engine = create_async_engine(settings.database_url, future=True, echo=False)
+logger = logging.getLogger("nexa.db")
+
+# live pool counters per engine role ("primary", "replica"); read via get_pool_metrics()
+_pool_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _instrumented_pool_class(role: str) -> type:
+    """
+    Queue pool subclass that records how long callers wait for a connection.
+    `_do_get` is where the queue blocks when the pool and overflow are exhausted.
+    A class per role keeps the counters attached across pool.recreate().
+    """
+    stats = _pool_stats.setdefault(role, {
+        "checkouts": 0,
+        "checkout_timeouts": 0,
+        "wait_seconds_total": 0.0,
+        "wait_seconds_max": 0.0,
+    })
+
+    class _InstrumentedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except sa_exc.TimeoutError:
+                stats["checkout_timeouts"] += 1
+                raise
+            waited = time.perf_counter() - start
+            stats["checkouts"] += 1
+            stats["wait_seconds_total"] += waited
+            if waited > stats["wait_seconds_max"]:
+                stats["wait_seconds_max"] = waited
+            return conn
+
+    return _InstrumentedQueuePool
+
+
+def _engine_kwargs(role: str = "primary") -> Dict[str, Any]:
+    """
+    Build create_async_engine() kwargs from Settings.
+    In pgbouncer mode (transaction pooling) server-side prepared statements cannot be
+    reused across transactions, so both asyncpg's and SQLAlchemy's statement caches are
+    disabled and statements get unique names.
+    """
+    connect_args: Dict[str, Any] = {}
+    if settings.db_pgbouncer_mode:
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        connect_args["prepared_statement_cache_size"] = settings.db_statement_cache_size
+
+    return {
+        "future": True,
+        "echo": settings.db_echo,
+        "poolclass": _instrumented_pool_class(role),
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_use_lifo": settings.db_pool_use_lifo,
+        "connect_args": connect_args,
+    }
+
+
+engine = create_async_engine(settings.database_url, **_engine_kwargs("primary"))
 async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+# optional read replica; when not configured read_session() always yields primary sessions
+replica_engine = None
+replica_session = None
+if settings.database_replica_url:
+    replica_engine = create_async_engine(settings.database_replica_url, **_engine_kwargs("replica"))
+    replica_session = async_sessionmaker(replica_engine, expire_on_commit=False, class_=AsyncSession)
+
+
+# --- read routing ---
+# Replay lag is 0 when the replica has applied everything it received, so an idle
+# primary doesn't look like a lagging replica.
+_REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+_replica_lag: Dict[str, float] = {"seconds": 0.0, "checked_at": 0.0}
+# scope -> monotonic time of the last write seen through note_write()
+_recent_writes: Dict[str, float] = {}
+
+
+def note_write(scope: str = "global") -> None:
+    """
+    Record a write so reads in the same scope go to the primary for
+    `db_read_your_writes_seconds` (read-your-writes on top of async replication).
+    """
+    _recent_writes[scope] = time.monotonic()
+
+
+def _written_recently(scope: Optional[str]) -> bool:
+    if scope is None:
+        return False
+    ts = _recent_writes.get(scope)
+    if ts is None:
+        return False
+    if time.monotonic() - ts < settings.db_read_your_writes_seconds:
+        return True
+    _recent_writes.pop(scope, None)
+    return False
+
+
+async def replica_lag_seconds() -> float:
+    """Cached replica replay lag; a failed check counts as infinitely lagging."""
+    now = time.monotonic()
+    if now - _replica_lag["checked_at"] < settings.db_replica_lag_check_interval:
+        return _replica_lag["seconds"]
+    try:
+        async with replica_session() as session:
+            lag = float((await session.execute(_REPLICA_LAG_SQL)).scalar() or 0.0)
+    except Exception as exc:
+        logger.warning("Replica lag check failed, routing reads to primary: %s", exc)
+        lag = float("inf")
+    _replica_lag["seconds"] = lag
+    _replica_lag["checked_at"] = now
+    return lag
+
+
+async def use_replica(scope: Optional[str] = None, force_primary: bool = False) -> bool:
+    if replica_session is None or force_primary or _written_recently(scope):
+        return False
+    return await replica_lag_seconds() <= settings.db_replica_max_lag_seconds
+
+
+@asynccontextmanager
+async def read_session(scope: Optional[str] = None, force_primary: bool = False) -> AsyncIterator[AsyncSession]:
+    """
+    Session for read-only queries. Routed to the replica when one is configured,
+    it is within `db_replica_max_lag_seconds`, and `scope` has not been written
+    recently; otherwise falls back to the primary.
+    """
+    factory = replica_session if await use_replica(scope, force_primary) else async_session
+    async with factory() as session:
+        yield session
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Snapshot of each engine's pool state plus cumulative checkout/wait counters."""
+    engines = {"primary": engine}
+    if replica_engine is not None:
+        engines["replica"] = replica_engine
+
+    out: Dict[str, Any] = {"pgbouncer_mode": settings.db_pgbouncer_mode}
+    for role, eng in engines.items():
+        pool = eng.sync_engine.pool
+        stats = _pool_stats[role]
+        checkouts = stats["checkouts"]
+        out[role] = {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": settings.db_max_overflow,
+            "checkouts": checkouts,
+            "checkout_timeouts": stats["checkout_timeouts"],
+            "wait_seconds_total": round(stats["wait_seconds_total"], 6),
+            "wait_seconds_max": round(stats["wait_seconds_max"], 6),
+            "wait_seconds_avg": round(stats["wait_seconds_total"] / checkouts, 6) if checkouts else 0.0,
+        }
+    if replica_engine is not None:
+        out["replica"]["lag_seconds"] = _replica_lag["seconds"]
+    return out
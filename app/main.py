@@ -1,10 +1,15 @@
 # app/main.py
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 import os
 
+from app.core.config import settings
+from app.core.jsonlib import FastJSONResponse, loads
+from app.connectors.registry import get_connector, load_connectors
+from app.connectors.pipeline import ingest
 from app.connectors.telegram import webhook as tg_webhook
+from app.services.backpressure import REJECT, current_level
 from app.api.platforms.telegram_api import router as telegram_platform_router
 
 # Optional: frontend helper routes (create file app/api/platforms/frontend_helpers.py as suggested)
@@ -30,6 +35,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# register platform connectors served by POST /webhook/{platform}
+load_connectors()
+
 # include routers
 app.include_router(telegram_platform_router)
 app.include_router(tg_webhook.router)
@@ -42,12 +50,41 @@ async def health():
     return {"status": "ok"}
 
 
-@app.post("/webhook/{platform}")
+@app.get("/health/db")
+async def health_db():
+    """Live connection pool metrics (checkouts, wait times, overflow)."""
+    from app.db.session import get_pool_metrics
+    return {"status": "ok", "pool": get_pool_metrics()}
+
+
+@app.get("/health/backpressure")
+async def health_backpressure():
+    """Backlog signals (queue depth/age, oldest unprocessed message) and the ingest admission level."""
+    from app.services.backpressure import snapshot
+    return {"status": "ok", **(await snapshot())}
+
+
+@app.post("/webhook/{platform}", response_class=FastJSONResponse)
 async def receive_webhook(platform: str, request: Request):
     """
-    Generic webhook receiver for platform connectors.
-    Platform-specific connector logic will validate and normalize payload.
+    Generic webhook receiver for platform connectors (app/connectors/registry.py).
+    The platform's connector authenticates, validates and normalizes the payload;
+    the shared pipeline dedups, stores and enqueues it.
+    Under heavy backlog bridges are told to back off (429 + Retry-After) and redeliver later.
     """
-    payload = await request.json()
-    # TODO: push into queue / normalize and store
-    return JSONResponse({"received_from": platform, "ok": True})
+    connector = get_connector(platform)
+    if connector is None:
+        raise HTTPException(status_code=404, detail=f"no connector for platform {platform!r}")
+    ctx = await connector.authenticate(request)
+    if connector.redelivers_on_429 and await current_level() == REJECT:
+        return JSONResponse(
+            {"ok": False, "detail": "ingest overloaded, retry later"},
+            status_code=429,
+            headers={"Retry-After": str(settings.backpressure_retry_after_seconds)},
+        )
+    try:
+        payload = loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid JSON body")
+    # returned as a response object so FastAPI skips its jsonable_encoder pass
+    return FastJSONResponse(await ingest(connector, connector.parse(payload), ctx))
@@ -0,0 +1,133 @@
+# app/services/account_cache.py
+"""
+Read-through cache of UserPlatformAccount links used on the outbound send path.
+
+Two lookups are cached, both as plain dicts ({"id", "user_id", "platform_user_id",
+"platform_chat_id", "bot_id"}) or None when no link exists:
+  - user -> account   (send_message_route)
+  - chat -> account   (reply_message)
+
+Entries live in Redis so every web process shares them, with a short in-process
+layer in front to skip the Redis round-trip for hot users. Anything that changes
+a link (the verification flow in telegram_webhook, /unlink) must call
+invalidate_account(); other processes may still serve their local copy for up
+to `account_cache_local_ttl_seconds`.
+"""
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.models import UserPlatformAccount
+from app.db.session import read_session
+
+logger = logging.getLogger("nexa.account_cache")
+
+_KEY_PREFIX = "nexa:acct"
+_MISSING = ""  # cached negative result
+_LOCAL_MAX_ENTRIES = 10_000
+
+# key -> (expires_at monotonic, value)
+_local: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+
+def _user_key(platform: str, user_id: int) -> str:
+    return f"{_KEY_PREFIX}:user:{platform}:{user_id}"
+
+
+def _chat_key(platform: str, chat_id: str) -> str:
+    return f"{_KEY_PREFIX}:chat:{platform}:{chat_id}"
+
+
+def _to_dict(acct: Optional[UserPlatformAccount]) -> Optional[Dict[str, Any]]:
+    if acct is None:
+        return None
+    return {
+        "id": acct.id,
+        "user_id": acct.user_id,
+        "platform_user_id": acct.platform_user_id,
+        "platform_chat_id": acct.platform_chat_id,
+        "bot_id": acct.bot_id,
+    }
+
+
+async def _load(*where) -> Optional[Dict[str, Any]]:
+    # fills always read the primary: a lagging replica read right after an
+    # invalidation (possibly in another process) would write the stale link back
+    # into Redis for the full TTL. The cache already absorbs the read load.
+    stmt = select(UserPlatformAccount).where(*where)
+    async with read_session(force_primary=True) as session:
+        acct = (await session.execute(stmt)).scalars().first()
+    return _to_dict(acct)
+
+
+async def _get(key: str, loader) -> Optional[Dict[str, Any]]:
+    now = time.monotonic()
+    hit = _local.get(key)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+
+    redis = None
+    try:
+        redis = get_redis()
+        raw = await redis.get(key)
+    except Exception as exc:
+        logger.warning("Account cache read failed for %s: %s", key, exc)
+        raw = None
+        redis = None
+
+    if raw is not None:
+        value = None if raw == _MISSING else json.loads(raw)
+    else:
+        value = await loader()
+        if redis is not None:
+            ttl = settings.account_cache_ttl_seconds if value else settings.account_cache_negative_ttl_seconds
+            try:
+                await redis.set(key, json.dumps(value) if value else _MISSING, ex=ttl)
+            except Exception as exc:
+                logger.warning("Account cache write failed for %s: %s", key, exc)
+
+    if len(_local) >= _LOCAL_MAX_ENTRIES:
+        _local.pop(next(iter(_local)), None)
+    _local[key] = (now + settings.account_cache_local_ttl_seconds, value)
+    return value
+
+
+async def get_account_for_user(user_id: int, platform: str = "telegram") -> Optional[Dict[str, Any]]:
+    return await _get(
+        _user_key(platform, user_id),
+        lambda: _load(
+            UserPlatformAccount.user_id == user_id,
+            UserPlatformAccount.platform == platform,
+        ),
+    )
+
+
+async def get_account_for_chat(chat_id: str, platform: str = "telegram") -> Optional[Dict[str, Any]]:
+    return await _get(
+        _chat_key(platform, chat_id),
+        lambda: _load(
+            UserPlatformAccount.platform == platform,
+            UserPlatformAccount.platform_chat_id == chat_id,
+        ),
+    )
+
+
+async def invalidate_account(platform: str, user_id: Optional[int] = None, chat_ids: Iterable[Optional[str]] = ()) -> None:
+    """Drop cached links for a user and any chat ids it was (or now is) linked to."""
+    keys = []
+    if user_id is not None:
+        keys.append(_user_key(platform, user_id))
+    keys.extend(_chat_key(platform, c) for c in chat_ids if c)
+    for k in keys:
+        _local.pop(k, None)
+    if not keys:
+        return
+    try:
+        await get_redis().delete(*keys)
+    except Exception as exc:
+        logger.warning("Account cache invalidation failed for %s: %s", keys, exc)
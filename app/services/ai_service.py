@@ -2,11 +2,27 @@ import httpx
 import logging
 import asyncio
 import random
+import hashlib
+import json
 from app.core.config import settings
+from app.services.singleflight import single_flight
+from app.services.circuit_breaker import open_models, record_failure, record_success
 
 logger = logging.getLogger("nexa.ai_service")
 
 
+def build_prompt(context: dict) -> str:
+    return (
+        f"User message: {context['text']}\n"
+        f"Sender: {context.get('sender_name')}\n"
+        "Give 3 short reply suggestions in different tones (direct, friendly, professional)."
+    )
+
+
+def parse_suggestions(text: str) -> list:
+    return [s.strip() for s in text.split("\n") if s.strip()]
+
+
 async def generate_reply_suggestions(context: dict) -> list:
     """
     Wrapper to call LLM provider with retries/backoff on 429 rate-limit responses.
@@ -17,17 +33,37 @@ async def generate_reply_suggestions(context: dict) -> list:
         logger.debug("No OpenAI API key configured; skipping suggestions.")
         return []
 
-    prompt = (
-        f"User message: {context['text']}\n"
-        f"Sender: {context.get('sender_name')}\n"
-        "Give 3 short reply suggestions in different tones (direct, friendly, professional)."
-    )
+    prompt = build_prompt(context)
+    # the deadline covers waiting on a single-flight leader too, not only our own upstream call
+    try:
+        return await asyncio.wait_for(_request_suggestions(prompt), timeout=settings.ai_deadline_seconds)
+    except asyncio.TimeoutError:
+        logger.error("OpenAI suggestions unavailable: deadline of %.1fs exceeded", settings.ai_deadline_seconds)
+        return []
+
+
+class _AbortSuggestions(Exception):
+    """Non-retryable provider error: stop trying candidates for this prompt."""
+
+
+async def _request_suggestions(prompt: str) -> list:
+    """
+    Call chat/completions for `prompt` across model candidates. Models with an
+    open circuit breaker are skipped.
+    """
+    if not settings.ai_singleflight_enabled:
+        return await _request_across_candidates(prompt)
+    # redeliveries and broadcasts produce identical prompts; make one upstream call for all of them
+    key = hashlib.sha256(f"{settings.openai_model}\n{prompt}".encode("utf-8")).hexdigest()
+    return await single_flight(key, lambda: _request_across_candidates(prompt))
 
+
+async def _request_across_candidates(prompt: str) -> list:
     headers = {"Authorization": f"Bearer {settings.openai_api_key}"}
 
     async def _fetch_available_models(client: httpx.AsyncClient) -> set:
         try:
-            resp = await client.get("https://api.openai.com/v1/models", headers=headers)
+            resp = await client.get(f"{settings.openai_api_base}/models", headers=headers)
             resp.raise_for_status()
             data = resp.json()
             models = {m.get("id") for m in data.get("data", []) if m.get("id")}
@@ -43,10 +79,6 @@ async def generate_reply_suggestions(context: dict) -> list:
     preferred = settings.openai_model
     priority = [preferred, "gpt-4o-mini", "gpt-4o", "gpt-4", "gpt-3.5-turbo", "gpt-3.5-turbo-16k"]
 
-    backoff_base = 1.0
-    # We'll attempt per-model retries, and move to the next candidate if rate-limited repeatedly.
-    per_model_attempts = 3
-
     async with httpx.AsyncClient(timeout=30.0) as client:
         available_models = await _fetch_available_models(client)
 
@@ -71,84 +103,240 @@ async def generate_reply_suggestions(context: dict) -> list:
             # fall back to configured or common defaults
             candidates = [preferred or "gpt-4o-mini", "gpt-4o", "gpt-4", "gpt-3.5-turbo"]
 
+        unhealthy = await open_models(candidates)
+        if unhealthy:
+            logger.info("Skipping models with open circuit: %s", sorted(unhealthy))
+            candidates = [m for m in candidates if m not in unhealthy]
+
         logger.info("OpenAI available models count=%d", len(available_models) if available_models else 0)
         logger.info("Model candidates: %s", candidates)
 
-        # Try candidates in order. For each model, try `per_model_attempts` with backoff.
-        for chosen_model in candidates:
-            body = {
-                "model": chosen_model,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 200,
-            }
+        try:
+            suggestions = await _race_candidates(client, headers, prompt, candidates)
+        except _AbortSuggestions:
+            return []
+        if suggestions:
+            return suggestions
 
-            for attempt in range(1, per_model_attempts + 1):
-                try:
-                    resp = await client.post(
-                        "https://api.openai.com/v1/chat/completions",
-                        json=body,
-                        headers=headers,
-                    )
-
-                    # If successful, parse and return suggestions
-                    resp.raise_for_status()
-                    data = resp.json()
-                    # parse response to get suggestions (implementation depends on model shape)
-                    text = data["choices"][0]["message"]["content"]
-                    suggestions = [s.strip() for s in text.split("\n") if s.strip()]
+    logger.error("OpenAI suggestions unavailable: exhausted all model candidates")
+    return []
+
+
+async def _race_candidates(client: httpx.AsyncClient, headers: dict, prompt: str, candidates: list) -> list:
+    """
+    Try candidates in order; the next one starts when the current one gives up.
+    With `ai_hedge_after_seconds` > 0 the next candidate also starts if the current
+    one hasn't answered within that time (at most two in flight), and the first
+    successful answer wins; the loser is cancelled.
+    """
+    remaining = iter(candidates)
+    running = set()
+    hedge_after = settings.ai_hedge_after_seconds or None
+
+    def _launch() -> bool:
+        model = next(remaining, None)
+        if model is None:
+            return False
+        running.add(asyncio.ensure_future(_try_model(client, headers, prompt, model)))
+        return True
+
+    _launch()
+    try:
+        while running:
+            done, _ = await asyncio.wait(
+                running,
+                timeout=hedge_after if len(running) < 2 else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                # hedge: the current candidate is slow, fire the next one alongside it
+                if _launch():
+                    logger.info("Hedging suggestion request after %.2fs", hedge_after)
+                else:
+                    hedge_after = None
+                continue
+            for task in done:
+                running.discard(task)
+                suggestions = task.result()
+                if suggestions:
                     return suggestions
+            if not running:
+                _launch()
+        return []
+    finally:
+        for task in running:
+            task.cancel()
+
 
-                except httpx.HTTPStatusError as exc:
-                    status = exc.response.status_code
-                    # Rate limited: check Retry-After header if present
-                    if status == 429:
-                        retry_after = None
-                        try:
-                            retry_after = int(exc.response.headers.get("Retry-After"))
-                        except Exception:
-                            retry_after = None
-
-                        if retry_after is not None:
-                            wait = retry_after
-                        else:
-                            # exponential backoff with jitter
-                            wait = backoff_base * (2 ** (attempt - 1)) + random.uniform(0, 1)
-
-                        logger.warning(
-                            "OpenAI rate-limited (429) for model %s. attempt=%d/%d - backing off %.2f seconds",
-                            chosen_model,
-                            attempt,
-                            per_model_attempts,
-                            wait,
-                        )
-                        await asyncio.sleep(wait)
-                        # if this was the last attempt for this model, break to try next model
-                        if attempt == per_model_attempts:
-                            logger.info("Exhausted retries for model %s, trying next candidate.", chosen_model)
-                            break
-                        continue
-                    else:
-                        # Other HTTP errors should be logged and abort retries overall
-                        logger.error("OpenAI HTTP error for model %s: %s %s", chosen_model, status, exc.response.text)
-                        return []
-
-                except Exception as exc:  # network errors, timeouts, etc.
-                    # transient network error — back off and retry a few times for this model
+async def _try_model(client: httpx.AsyncClient, headers: dict, prompt: str, chosen_model: str):
+    """
+    Up to `per_model_attempts` tries with backoff on 429/network errors. Returns
+    suggestions, or None to move on to the next candidate. Raises
+    _AbortSuggestions on other HTTP errors.
+    """
+    backoff_base = 1.0
+    # We'll attempt per-model retries, and move to the next candidate if rate-limited repeatedly.
+    per_model_attempts = 3
+    body = {
+        "model": chosen_model,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 200,
+    }
+
+    for attempt in range(1, per_model_attempts + 1):
+        try:
+            resp = await client.post(
+                f"{settings.openai_api_base}/chat/completions",
+                json=body,
+                headers=headers,
+            )
+
+            # If successful, parse and return suggestions
+            resp.raise_for_status()
+            data = resp.json()
+            # parse response to get suggestions (implementation depends on model shape)
+            text = data["choices"][0]["message"]["content"]
+            await record_success(chosen_model)
+            return parse_suggestions(text)
+
+        except httpx.HTTPStatusError as exc:
+            status = exc.response.status_code
+            # Rate limited: check Retry-After header if present
+            if status == 429:
+                await record_failure(chosen_model)
+                if attempt == per_model_attempts:
+                    logger.info("Exhausted retries for model %s, trying next candidate.", chosen_model)
+                    return None
+
+                retry_after = None
+                try:
+                    retry_after = int(exc.response.headers.get("Retry-After"))
+                except Exception:
+                    retry_after = None
+
+                if retry_after is not None:
+                    wait = retry_after
+                else:
+                    # exponential backoff with jitter
                     wait = backoff_base * (2 ** (attempt - 1)) + random.uniform(0, 1)
-                    logger.warning(
-                        "OpenAI request failed for model %s (attempt %d/%d): %s — retrying in %.1fs",
-                        chosen_model,
-                        attempt,
-                        per_model_attempts,
-                        exc,
-                        wait,
-                    )
-                    await asyncio.sleep(wait)
-                    # if this was the last attempt for this model, break to next candidate
-                    if attempt == per_model_attempts:
-                        logger.info("Exhausted retries for model %s due to errors, trying next candidate.", chosen_model)
-                        break
-                    continue
 
-    logger.error("OpenAI suggestions unavailable: exhausted all model candidates")
-    return []
+                logger.warning(
+                    "OpenAI rate-limited (429) for model %s. attempt=%d/%d - backing off %.2f seconds",
+                    chosen_model,
+                    attempt,
+                    per_model_attempts,
+                    wait,
+                )
+                await asyncio.sleep(wait)
+                continue
+            else:
+                # Other HTTP errors should be logged and abort retries overall
+                if status >= 500:
+                    await record_failure(chosen_model)
+                logger.error("OpenAI HTTP error for model %s: %s %s", chosen_model, status, exc.response.text)
+                raise _AbortSuggestions(status)
+
+        except Exception as exc:  # network errors, timeouts, etc.
+            await record_failure(chosen_model)
+            if attempt == per_model_attempts:
+                logger.info("Exhausted retries for model %s due to errors, trying next candidate.", chosen_model)
+                return None
+            # transient network error — back off and retry a few times for this model
+            wait = backoff_base * (2 ** (attempt - 1)) + random.uniform(0, 1)
+            logger.warning(
+                "OpenAI request failed for model %s (attempt %d/%d): %s — retrying in %.1fs",
+                chosen_model,
+                attempt,
+                per_model_attempts,
+                exc,
+                wait,
+            )
+            await asyncio.sleep(wait)
+            continue
+    return None
+
+
+# --- Batch API mode ---
+# For non-interactive backlogs: messages are collected into a JSONL file of
+# chat/completions requests, submitted as one provider batch and written back in
+# bulk when it completes (see submit_ai_batch / poll_ai_batches in worker_tasks).
+# scripts/fake_batch_api.py checks the upload, polling and output parsing against
+# a local fake of the provider's /files and /batches endpoints.
+
+def _batch_custom_id(message_id: int) -> str:
+    return f"nm-{message_id}"
+
+
+async def submit_suggestion_batch(messages: list) -> str:
+    """Upload a JSONL batch for `messages` (NormalizedMessage rows); returns the provider batch id."""
+    headers = {"Authorization": f"Bearer {settings.openai_api_key}"}
+    lines = []
+    for m in messages:
+        lines.append(json.dumps({
+            "custom_id": _batch_custom_id(m.id),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": settings.openai_model,
+                "messages": [{"role": "user", "content": build_prompt({"text": m.text, "sender_name": m.sender_name})}],
+                "max_tokens": 200,
+            },
+        }))
+    content = ("\n".join(lines) + "\n").encode("utf-8")
+
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        resp = await client.post(
+            f"{settings.openai_api_base}/files",
+            headers=headers,
+            data={"purpose": "batch"},
+            files={"file": ("suggestions.jsonl", content, "application/jsonl")},
+        )
+        resp.raise_for_status()
+        file_id = resp.json()["id"]
+
+        resp = await client.post(
+            f"{settings.openai_api_base}/batches",
+            headers=headers,
+            json={
+                "input_file_id": file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": settings.ai_batch_completion_window,
+            },
+        )
+        resp.raise_for_status()
+        batch_id = resp.json()["id"]
+    logger.info("Submitted suggestion batch %s with %d requests", batch_id, len(lines))
+    return batch_id
+
+
+async def fetch_suggestion_batch(batch_id: str) -> tuple:
+    """
+    Return (status, results) for a provider batch. `results` maps message id to
+    its suggestion list once the batch is completed, else it is empty.
+    """
+    headers = {"Authorization": f"Bearer {settings.openai_api_key}"}
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        resp = await client.get(f"{settings.openai_api_base}/batches/{batch_id}", headers=headers)
+        resp.raise_for_status()
+        batch = resp.json()
+        status = batch.get("status")
+        if status != "completed" or not batch.get("output_file_id"):
+            return status, {}
+
+        results = {}
+        async with client.stream("GET", f"{settings.openai_api_base}/files/{batch['output_file_id']}/content", headers=headers) as stream:
+            stream.raise_for_status()
+            async for line in stream.aiter_lines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                custom_id = row.get("custom_id", "")
+                body = (row.get("response") or {}).get("body") or {}
+                try:
+                    text = body["choices"][0]["message"]["content"]
+                except (KeyError, IndexError, TypeError):
+                    logger.warning("Batch %s: no completion for %s: %s", batch_id, custom_id, row.get("error"))
+                    continue
+                if custom_id.startswith("nm-"):
+                    results[int(custom_id[3:])] = parse_suggestions(text)
+    return status, results
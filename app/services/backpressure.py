@@ -0,0 +1,134 @@
+# app/services/backpressure.py
+"""
+Ingest admission control driven by processing backlog.
+
+Signals, sampled at most every `backpressure_check_interval_seconds` per process:
+  - depth of the Celery queues feeding process_normalized_message (LLEN on the broker);
+  - age of the oldest task at the head of those queues (enqueued_at header,
+    the ingest time for tasks relayed from the outbox);
+  - depth and oldest-row age of task_outbox, i.e. tasks the relay has not
+    published yet (a stopped or slow relay is backlog too).
+Broker and outbox depths are added up and the older age wins. Only tasks
+that are actually queued count: a message that is unprocessed for other
+reasons (parked in the Batch API lane, a lost task) never holds the system
+in a degraded level.
+
+The worst signal picks a level:
+  normal      everything is stored and enqueued for AI processing;
+  shed        only hot threads (see hot_threads) get AI processing;
+  store_only  messages are stored without AI processing;
+  reject      as store_only, and bridge clients get 429 + Retry-After.
+
+Messages that skip AI are stored with processed = false and ai_skip_reason set
+to the level, so they can be told apart and backfilled later.
+"""
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Set, Tuple
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.models import TaskOutbox
+from app.db.session import async_session
+from app.services.hot_threads import hot_threads
+from app.tasks.enqueue import DEFAULT_QUEUE
+
+logger = logging.getLogger("nexa.backpressure")
+
+NORMAL, SHED, STORE_ONLY, REJECT = "normal", "shed", "store_only", "reject"
+
+_sample: Dict[str, Any] = {"level": NORMAL, "checked_at": 0.0}
+
+
+def _queues():
+    return [DEFAULT_QUEUE] + [f"nexa_bot_{i}" for i in range(settings.celery_bot_queue_shards)]
+
+
+def _level_for(depth: int, age: float) -> str:
+    level = NORMAL
+    for name, max_depth, max_age in (
+        (SHED, settings.backpressure_shed_depth, settings.backpressure_shed_age_seconds),
+        (STORE_ONLY, settings.backpressure_store_only_depth, settings.backpressure_store_only_age_seconds),
+        (REJECT, settings.backpressure_reject_depth, settings.backpressure_reject_age_seconds),
+    ):
+        if (max_depth and depth >= max_depth) or (max_age and age >= max_age):
+            level = name
+    return level
+
+
+async def _measure() -> Dict[str, Any]:
+    queues = _queues()
+    depth, head_age = 0, 0.0
+    now = time.time()
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for q in queues:
+                pipe.llen(q)
+                # kombu LPUSHes and BRPOPs, so the oldest task sits at the tail
+                pipe.lindex(q, -1)
+            res = await pipe.execute()
+        for i in range(len(queues)):
+            depth += res[2 * i] or 0
+            head = res[2 * i + 1]
+            if head:
+                enqueued_at = (json.loads(head).get("headers") or {}).get("enqueued_at")
+                if enqueued_at:
+                    head_age = max(head_age, now - float(enqueued_at))
+    except Exception as exc:
+        logger.warning("Queue depth check failed: %s", exc)
+
+    outbox_depth, outbox_age = 0, 0.0
+    try:
+        # published rows are deleted, so this only touches the undelivered backlog
+        async with async_session() as session:
+            outbox_depth, oldest = (await session.execute(
+                select(func.count(), func.min(TaskOutbox.created_at)).select_from(TaskOutbox)
+            )).one()
+        if oldest is not None:
+            outbox_age = max(0.0, now - oldest.timestamp())
+    except Exception as exc:
+        logger.warning("Outbox backlog check failed: %s", exc)
+
+    return {
+        "queue_depth": depth,
+        "queue_head_age_seconds": round(head_age, 3),
+        "outbox_depth": outbox_depth,
+        "outbox_age_seconds": round(outbox_age, 3),
+    }
+
+
+async def snapshot() -> Dict[str, Any]:
+    """Current (cached) backlog signals and the admission level derived from them."""
+    if not settings.backpressure_enabled:
+        return {"level": NORMAL, "enabled": False}
+    now = time.monotonic()
+    if now - _sample["checked_at"] >= settings.backpressure_check_interval_seconds:
+        # stamp first so concurrent requests don't all re-measure
+        _sample["checked_at"] = now
+        m = await _measure()
+        level = _level_for(
+            m["queue_depth"] + m["outbox_depth"],
+            max(m["queue_head_age_seconds"], m["outbox_age_seconds"]),
+        )
+        if level != _sample["level"]:
+            logger.warning("Ingest admission level %s -> %s (%s)", _sample["level"], level, m)
+        _sample.update(m, level=level)
+    return dict(_sample, enabled=True)
+
+
+async def current_level() -> str:
+    return (await snapshot())["level"]
+
+
+async def admit_for_ai(platform: str, thread_ids: Iterable[str]) -> Tuple[str, Set[str]]:
+    """The current level and which of `thread_ids` may be enqueued for AI processing at it."""
+    thread_ids = list(thread_ids)
+    level = await current_level()
+    if level == NORMAL:
+        return level, set(thread_ids)
+    if level == SHED:
+        return level, await hot_threads(platform, thread_ids, ignore_disabled=True)
+    return level, set()
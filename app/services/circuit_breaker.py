@@ -0,0 +1,66 @@
+# app/services/circuit_breaker.py
+"""
+Per-model circuit breaker shared by all workers through Redis.
+
+closed    failures are counted in a `ai_breaker_window_seconds` window; reaching
+          `ai_breaker_failure_threshold` opens the breaker.
+open      the model is skipped for `ai_breaker_cooldown_seconds`.
+half-open once the cooldown expires the model is tried again; during the
+          following window a single failure re-opens it, a success closes it.
+
+Redis errors never block a call: the breaker then reports every model as closed.
+"""
+import logging
+from typing import Iterable, Set
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("nexa.circuit_breaker")
+
+_PREFIX = "nexa:cb"
+
+
+def _keys(model: str):
+    return f"{_PREFIX}:{model}:fail", f"{_PREFIX}:{model}:open", f"{_PREFIX}:{model}:probation"
+
+
+async def open_models(models: Iterable[str]) -> Set[str]:
+    """Subset of `models` whose breaker is currently open."""
+    models = list(models)
+    if not models:
+        return set()
+    try:
+        flags = await get_redis().mget([_keys(m)[1] for m in models])
+    except Exception as exc:
+        logger.warning("Circuit breaker state unavailable: %s", exc)
+        return set()
+    return {m for m, f in zip(models, flags) if f}
+
+
+async def record_failure(model: str) -> None:
+    fail_key, open_key, probation_key = _keys(model)
+    try:
+        redis = get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.incr(fail_key)
+            pipe.expire(fail_key, settings.ai_breaker_window_seconds, nx=True)
+            pipe.exists(probation_key)
+            failures, _, probation = await pipe.execute()
+        if probation or failures >= settings.ai_breaker_failure_threshold:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(open_key, 1, ex=settings.ai_breaker_cooldown_seconds)
+                pipe.set(probation_key, 1, ex=settings.ai_breaker_cooldown_seconds + settings.ai_breaker_window_seconds)
+                pipe.delete(fail_key)
+                await pipe.execute()
+            logger.warning("Circuit opened for model %s (%d failures)", model, failures)
+    except Exception as exc:
+        logger.warning("Failed to record failure for model %s: %s", model, exc)
+
+
+async def record_success(model: str) -> None:
+    fail_key, _, probation_key = _keys(model)
+    try:
+        await get_redis().delete(fail_key, probation_key)
+    except Exception as exc:
+        logger.warning("Failed to record success for model %s: %s", model, exc)
@@ -0,0 +1,94 @@
+# app/services/hot_threads.py
+"""
+Priority lane for threads where a fast suggestion matters.
+
+A thread is hot when an agent has it open (the UI sends a viewing heartbeat)
+or when agents replied to it at least `priority_lane_min_replies` times within
+`priority_lane_reply_window_seconds`. Messages in hot threads are sent to
+PRIORITY_QUEUE, which dedicated workers consume, instead of waiting behind the
+backlog. Admission is capped at `priority_lane_max_per_minute` across all web
+processes; over the cap, or when the lane is disabled, messages take the
+regular queue as before.
+"""
+import logging
+import time
+from typing import Iterable, Set
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("nexa.hot_threads")
+
+_PREFIX = "nexa:hot"
+
+
+def _view_key(platform: str, thread_id: str) -> str:
+    return f"{_PREFIX}:view:{platform}:{thread_id}"
+
+
+def _reply_key(platform: str, thread_id: str) -> str:
+    return f"{_PREFIX}:replies:{platform}:{thread_id}"
+
+
+async def mark_viewing(platform: str, thread_id: str) -> None:
+    """Heartbeat from an agent's open thread view; expires unless refreshed."""
+    try:
+        await get_redis().set(_view_key(platform, thread_id), 1, ex=settings.priority_lane_view_ttl_seconds)
+    except Exception as exc:
+        # heartbeats repeat; a missed one only delays the thread's priority lane
+        logger.warning("Failed to record viewing for %s/%s: %s", platform, thread_id, exc)
+
+
+async def record_reply(platform: str, thread_id: str) -> None:
+    """Count an agent reply towards the thread's recent reply rate."""
+    key = _reply_key(platform, thread_id)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, settings.priority_lane_reply_window_seconds, nx=True)
+            await pipe.execute()
+    except Exception as exc:
+        # the reply itself already went out; losing one sample only delays hotness
+        logger.warning("Failed to record reply for %s/%s: %s", platform, thread_id, exc)
+
+
+async def hot_threads(platform: str, thread_ids: Iterable[str], ignore_disabled: bool = False) -> Set[str]:
+    """
+    Subset of `thread_ids` that currently qualify for the priority lane.
+    `ignore_disabled` evaluates the signals even with the lane off (load shedding uses them).
+    """
+    ids = [t for t in dict.fromkeys(thread_ids) if t]
+    if not (settings.priority_lane_enabled or ignore_disabled) or not ids:
+        return set()
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for t in ids:
+                pipe.exists(_view_key(platform, t))
+                pipe.get(_reply_key(platform, t))
+            res = await pipe.execute()
+    except Exception as exc:
+        logger.warning("Hot-thread lookup failed, using regular queue: %s", exc)
+        return set()
+    hot = set()
+    for i, t in enumerate(ids):
+        viewing, replies = res[2 * i], res[2 * i + 1]
+        if viewing or int(replies or 0) >= settings.priority_lane_min_replies:
+            hot.add(t)
+    return hot
+
+
+async def admit(n: int) -> int:
+    """Reserve up to `n` priority slots in the current minute; returns how many were granted."""
+    if n <= 0:
+        return 0
+    key = f"{_PREFIX}:admitted:{int(time.time() // 60)}"
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.incrby(key, n)
+            pipe.expire(key, 120)
+            used = (await pipe.execute())[0]
+    except Exception as exc:
+        logger.warning("Priority admission check failed, using regular queue: %s", exc)
+        return 0
+    over = max(0, used - settings.priority_lane_max_per_minute)
+    return max(0, n - over)
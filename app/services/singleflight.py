@@ -0,0 +1,116 @@
+# app/services/singleflight.py
+"""
+Single-flight execution: concurrent calls with the same key share one upstream call.
+
+Two layers:
+  - in-process: callers on the same event loop await the leader's future; if
+    the leader fails or is cancelled they elect a new leader among themselves;
+  - cross-process: a Redis lock elects one leader across workers, which stores
+    its result under a short-lived key that the other workers poll for.
+
+Results must be JSON-serializable. Only truthy results are shared through Redis,
+so when the leader fails the lock is released and the next waiter makes the
+call itself rather than everyone receiving the failure.
+"""
+import asyncio
+import json
+import logging
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger("nexa.singleflight")
+
+_PREFIX = "nexa:sf"
+# compare-and-delete so a leader never releases a lock that expired and was re-acquired
+_RELEASE_LUA = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+# loop -> key -> leader future (futures are loop-bound; Celery runs tasks on fresh loops)
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = weakref.WeakKeyDictionary()
+
+
+async def single_flight(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    loop = asyncio.get_running_loop()
+    local = _inflight.setdefault(loop, {})
+    fut = local.get(key)
+    if fut is not None:
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            if not fut.cancelled():
+                raise  # this caller was cancelled, not the leader
+        except Exception:
+            pass
+        # the leader failed or was cancelled: don't inherit that, run again with a new leader
+        return await single_flight(key, fn)
+
+    fut = loop.create_future()
+    local[key] = fut
+    try:
+        result = await _distributed(key, fn)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as exc:
+        fut.set_exception(exc)
+        # mark retrieved so an unawaited leader failure doesn't log "exception never retrieved"
+        fut.exception()
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        local.pop(key, None)
+
+
+async def _distributed(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    lock_key, result_key = f"{_PREFIX}:lock:{key}", f"{_PREFIX}:result:{key}"
+    try:
+        redis = get_redis()
+        cached = await redis.get(result_key)
+    except Exception as exc:
+        logger.warning("Single-flight unavailable (redis): %s", exc)
+        return await fn()
+    if cached is not None:
+        return json.loads(cached)
+
+    token = uuid.uuid4().hex
+    deadline = asyncio.get_running_loop().time() + settings.ai_singleflight_wait_seconds
+    delay = 0.05
+    while True:
+        try:
+            acquired = await redis.set(lock_key, token, nx=True, ex=settings.ai_singleflight_lock_ttl_seconds)
+        except Exception as exc:
+            logger.warning("Single-flight unavailable (redis): %s", exc)
+            return await fn()
+        if acquired:
+            try:
+                result = await fn()
+                if result:
+                    try:
+                        await redis.set(result_key, json.dumps(result), ex=settings.ai_singleflight_result_ttl_seconds)
+                    except Exception as exc:
+                        logger.warning("Failed to share single-flight result for %s: %s", key, exc)
+                return result
+            finally:
+                try:
+                    await redis.eval(_RELEASE_LUA, 1, lock_key, token)
+                except Exception as exc:
+                    logger.warning("Failed to release single-flight lock %s: %s", lock_key, exc)
+
+        # another worker is making the call; wait for its result or for the lock to free up
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        try:
+            cached = await redis.get(result_key)
+        except Exception as exc:
+            logger.warning("Single-flight unavailable (redis): %s", exc)
+            return await fn()
+        if cached is not None:
+            return json.loads(cached)
+        if asyncio.get_running_loop().time() >= deadline:
+            logger.warning("Timed out waiting for single-flight leader on %s; calling upstream", key)
+            return await fn()
@@ -16,3 +16,10 @@ celery = Celery(
 
 celery.conf.task_default_queue = "nexa_default"
 
+# Batch API mode: periodically submit deferred messages and collect finished batches
+# (run `celery -A app.tasks.celery_app beat` alongside the workers)
+if settings.ai_batch_queues:
+    celery.conf.beat_schedule = {
+        "submit-ai-batch": {"task": "submit_ai_batch", "schedule": settings.ai_batch_interval_seconds},
+        "poll-ai-batches": {"task": "poll_ai_batches", "schedule": settings.ai_batch_interval_seconds},
+    }
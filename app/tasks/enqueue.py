@@ -1,12 +1,64 @@
 # app/tasks/enqueue.py
+import time
+from typing import List, Optional, Tuple
+from app.core.config import settings
 from app.tasks.celery_app import celery
 
-async def push_message_to_queue(message_id: int):
-    # push to celery
-    # If called from async FastAPI code, we call delay asynchronously by delegating to threadpool
-    from concurrent.futures import ThreadPoolExecutor
+DEFAULT_QUEUE = "nexa_default"
+# consumed by a dedicated worker pool (see app/services/hot_threads.py)
+PRIORITY_QUEUE = "nexa_priority"
+
+
+def _send(message_id: int, queue: str, producer=None, enqueued_at: Optional[float] = None):
+    # enqueued_at lets the backpressure monitor read the age of a queue's head; outbox rows
+    # pass their ingest time so time spent waiting for the relay counts too
+    celery.send_task(
+        "process_normalized_message", args=[message_id], queue=queue,
+        headers={"enqueued_at": enqueued_at or time.time()}, producer=producer,
+    )
+
+
+def publish_routed(routed: List[Tuple[int, str, Optional[float]]]):
+    """Blocking: publish (message_id, queue, enqueued_at or None) over a single broker connection."""
+    with celery.producer_or_acquire() as producer:
+        for message_id, queue, enqueued_at in routed:
+            _send(message_id, queue, producer=producer, enqueued_at=enqueued_at)
+
+
+def queue_for_bot(bot_id: Optional[int], dedicated_queue: Optional[str] = None) -> str:
+    """
+    Pick the Celery queue for a bot's messages. A bot with its own queue keeps it;
+    otherwise bots are spread over `celery_bot_queue_shards` queues
+    (nexa_bot_0..N-1) so one noisy tenant only shares capacity with its shard.
+    Workers must consume the shard queues, e.g. `-Q nexa_default,nexa_bot_0,nexa_bot_1`.
+    """
+    if dedicated_queue:
+        return dedicated_queue
+    shards = settings.celery_bot_queue_shards
+    if bot_id is None or shards <= 0:
+        return DEFAULT_QUEUE
+    return f"nexa_bot_{bot_id % shards}"
+
+
+async def route_thread_messages(
+    platform: str, messages: List[Tuple[int, str]], queue: Optional[str] = None
+) -> List[Tuple[int, str]]:
+    """
+    Pick the queue for each (message_id, platform_thread_id) pair. Messages in hot
+    threads go to PRIORITY_QUEUE while admission allows; everything else goes to `queue`.
+    """
+    from app.services.hot_threads import hot_threads, admit
+
+    hot = await hot_threads(platform, [t for _, t in messages])
+    candidates = [mid for mid, t in messages if t in hot]
+    priority = set(candidates[:await admit(len(candidates))])
+    return [(mid, PRIORITY_QUEUE if mid in priority else queue or DEFAULT_QUEUE) for mid, _ in messages]
+
+
+async def push_thread_messages(platform: str, messages: List[Tuple[int, str]], queue: Optional[str] = None):
+    """Publish (message_id, platform_thread_id) pairs directly, routed as route_thread_messages does."""
+    routed = await route_thread_messages(platform, messages, queue)
+
     import asyncio
     loop = asyncio.get_running_loop()
-    def _call():
-        celery.send_task("process_normalized_message", args=[message_id])
-    await loop.run_in_executor(None, _call)
+    await loop.run_in_executor(None, publish_routed, [(mid, q, None) for mid, q in routed])
@@ -0,0 +1,80 @@
+# app/tasks/outbox_relay.py
+"""
+Relay from the task_outbox table to the Celery broker.
+
+    python -m app.tasks.outbox_relay
+
+Each round claims up to `outbox_batch_size` rows with
+SELECT ... FOR UPDATE SKIP LOCKED, publishes them over one broker connection
+and deletes them in the same transaction, so several relays can run side by
+side without sending a row twice. If publishing fails the transaction rolls
+back and the rows are retried, which makes delivery at-least-once;
+process_normalized_message skips messages that are already processed.
+Published rows are deleted, so the table only ever holds the undelivered
+backlog and a claim never scans history.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.db.models import TaskOutbox
+from app.db.session import async_session
+from app.tasks.enqueue import publish_routed
+
+logger = logging.getLogger("nexa.outbox")
+
+_MAX_BACKOFF = 30.0
+
+
+async def relay_once(batch_size: int) -> int:
+    """Publish and delete one batch of outbox rows; returns how many were sent."""
+    async with async_session() as session:
+        async with session.begin():
+            q = await session.execute(
+                select(TaskOutbox.id, TaskOutbox.message_id, TaskOutbox.queue, TaskOutbox.created_at)
+                .order_by(TaskOutbox.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = q.all()
+            if not rows:
+                return 0
+            # kombu publishing is blocking; keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, publish_routed, [(r.message_id, r.queue, r.created_at.timestamp()) for r in rows]
+            )
+            await session.execute(delete(TaskOutbox).where(TaskOutbox.id.in_([r.id for r in rows])))
+    return len(rows)
+
+
+async def run(stop: Optional[asyncio.Event] = None):
+    """Drain the outbox until `stop` is set; sleeps only when a round comes back short."""
+    stop = stop or asyncio.Event()
+    batch_size = settings.outbox_batch_size
+    backoff = 1.0
+    logger.info("Outbox relay started (batch=%d)", batch_size)
+    while not stop.is_set():
+        try:
+            sent = await relay_once(batch_size)
+            backoff = 1.0
+        except Exception as exc:
+            # nothing was deleted, so the same rows are claimed again
+            logger.warning("Outbox relay failed: %s — retrying in %.1fs", exc, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, _MAX_BACKOFF)
+            continue
+        if sent:
+            logger.debug("Relayed %d outbox rows", sent)
+        if sent < batch_size:
+            await asyncio.sleep(settings.outbox_poll_interval_seconds)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logger.info("Exiting outbox relay.")
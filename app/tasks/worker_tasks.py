@@ -1,20 +1,44 @@
 # app/tasks/worker_tasks.py
 # import celery instance from package
+import logging
 from app.tasks.celery_app import celery
+from app.core.config import settings
 from app.db.session import async_session
 from app.db.models import NormalizedMessage
 # from services.ai_service import generate_reply_suggestions  # implement this
 
+logger = logging.getLogger("nexa.worker")
+
+# Redis list of message ids waiting for the next provider batch
+BATCH_PENDING_KEY = "nexa:ai:batch:pending"
+# Redis hash message id -> failed batch attempts so far
+BATCH_ATTEMPTS_KEY = "nexa:ai:batch:attempts"
+
+
+def _batch_queues() -> set:
+    return {q.strip() for q in settings.ai_batch_queues.split(",") if q.strip()}
+
+
 @celery.task(name="process_normalized_message")
 def process_normalized_message(msg_id: int):
     # run async context inside sync Celery worker using trio/asyncio loop-runner if needed
     import asyncio
     from sqlalchemy.ext.asyncio import AsyncSession
 
+    # queues listed in AI_BATCH_QUEUES defer to the Batch API instead of a realtime call
+    routing_key = (process_normalized_message.request.delivery_info or {}).get("routing_key")
+    if routing_key in _batch_queues():
+        async def _defer():
+            from app.core.redis_client import get_redis
+            await get_redis().rpush(BATCH_PENDING_KEY, msg_id)
+        _run_coro_on_new_loop(_defer())
+        return
+
     async def _process():
         async with async_session() as session:
             msg = await session.get(NormalizedMessage, msg_id)
-            if not msg:
+            # the outbox relay delivers at least once; a redelivered task finds the message processed
+            if not msg or msg.processed:
                 return
             # Call AI service (this may be an HTTP call to your ai service)
             try:
@@ -28,38 +52,163 @@ def process_normalized_message(msg_id: int):
                 "sender_name": msg.sender_name,
                 "platform": msg.platform,
             })
-            # store suggestions in DB or in a suggestions table (omitted here)
+            msg.suggestions = suggestions
             msg.processed = True
             session.add(msg)
             await session.commit()
-    # Run the async processing in a fresh event loop to avoid conflicts
-    # with Celery's process lifecycle and Windows event loop policy issues.
-    def _run_coro_on_new_loop(coro):
-        import asyncio, sys
-
-        # On Windows, asyncpg/sqlalchemy async sometimes requires the
-        # SelectorEventLoopPolicy; set it if available.
-        if sys.platform.startswith("win"):
-            policy_cls = getattr(asyncio, "WindowsSelectorEventLoopPolicy", None)
-            if policy_cls is not None:
-                try:
-                    asyncio.set_event_loop_policy(policy_cls())
-                except Exception:
-                    pass
-
-        loop = asyncio.new_event_loop()
+
+    _run_coro_on_new_loop(_process())
+
+
+@celery.task(name="submit_ai_batch")
+def submit_ai_batch():
+    """Drain deferred message ids into one provider batch (up to AI_BATCH_MAX_REQUESTS)."""
+    async def _submit():
+        from sqlalchemy import select
+        from app.core.redis_client import get_redis
+        from app.db.models import AIBatchJob
+        from app.services.ai_service import submit_suggestion_batch
+
+        redis = get_redis()
+        ids = [int(i) for i in (await redis.lpop(BATCH_PENDING_KEY, settings.ai_batch_max_requests) or [])]
+        if not ids:
+            return None
         try:
-            asyncio.set_event_loop(loop)
-            return loop.run_until_complete(coro)
-        finally:
+            async with async_session() as session:
+                q = await session.execute(select(NormalizedMessage).where(
+                    NormalizedMessage.id.in_(ids),
+                    NormalizedMessage.processed == False,
+                ))
+                messages = q.scalars().all()
+                if not messages:
+                    return None
+                batch_id = await submit_suggestion_batch(messages)
+                session.add(AIBatchJob(provider_batch_id=batch_id, status="submitted", message_ids=[m.id for m in messages]))
+                await session.commit()
+                return batch_id
+        except Exception:
+            # put the ids back so the next run picks them up
+            await redis.rpush(BATCH_PENDING_KEY, *ids)
+            raise
+
+    return _run_coro_on_new_loop(_submit())
+
+
+@celery.task(name="poll_ai_batches")
+def poll_ai_batches():
+    """Check open batch jobs; write completed results back in bulk and requeue failed ones."""
+    async def _poll():
+        from sqlalchemy import select
+        from app.db.models import AIBatchJob
+
+        async with async_session() as session:
+            q = await session.execute(select(AIBatchJob).where(
+                AIBatchJob.status.in_(["submitted", "validating", "in_progress", "finalizing"])
+            ))
+            jobs = q.scalars().all()
+
+        for job in jobs:
+            # one failing job must not hold up polling of the others
             try:
-                loop.run_until_complete(loop.shutdown_asyncgens())
+                await _poll_job(job)
             except Exception:
-                pass
-            loop.close()
+                logger.exception("Polling batch %s failed", job.provider_batch_id)
+
+    _run_coro_on_new_loop(_poll())
+
+
+async def _poll_job(job):
+    import datetime
+    from sqlalchemy import update
+    from app.core.redis_client import get_redis
+    from app.db.models import AIBatchJob
+    from app.services.ai_service import fetch_suggestion_batch
+
+    status, results = await fetch_suggestion_batch(job.provider_batch_id)
+    async with async_session() as session:
+        if status == "completed":
+            if results:
+                await session.execute(
+                    update(NormalizedMessage),
+                    [{"id": mid, "suggestions": s, "processed": True} for mid, s in results.items()],
+                )
+                await get_redis().hdel(BATCH_ATTEMPTS_KEY, *results.keys())
+            missing = [mid for mid in job.message_ids if mid not in results]
+            if missing:
+                await _retry_batch_messages(missing)
+            logger.info("Batch %s completed: %d written, %d retried", job.provider_batch_id, len(results), len(missing))
+        elif status in ("failed", "expired", "cancelled"):
+            await _retry_batch_messages(job.message_ids)
+            logger.warning("Batch %s %s; retrying %d messages", job.provider_batch_id, status, len(job.message_ids))
+
+        values = {"status": status}
+        if status in ("completed", "failed", "expired", "cancelled"):
+            values["completed_at"] = datetime.datetime.now(datetime.timezone.utc)
+        await session.execute(update(AIBatchJob).where(AIBatchJob.id == job.id).values(**values))
+        await session.commit()
+
+
+async def _retry_batch_messages(message_ids):
+    """
+    Put messages back for the next batch, or give up on those that already failed
+    `ai_batch_max_attempts` times: they are marked ai_skip_reason = "batch_failed"
+    instead of being resubmitted (and billed) forever.
+    """
+    from sqlalchemy import update
+    from app.core.redis_client import get_redis
+
+    redis = get_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for mid in message_ids:
+            pipe.hincrby(BATCH_ATTEMPTS_KEY, mid, 1)
+        attempts = await pipe.execute()
+    retry = [mid for mid, n in zip(message_ids, attempts) if n < settings.ai_batch_max_attempts]
+    give_up = [mid for mid, n in zip(message_ids, attempts) if n >= settings.ai_batch_max_attempts]
+    if retry:
+        await redis.rpush(BATCH_PENDING_KEY, *retry)
+    if give_up:
+        async with async_session() as session:
+            await session.execute(
+                update(NormalizedMessage).where(NormalizedMessage.id.in_(give_up)).values(ai_skip_reason="batch_failed")
+            )
+            await session.commit()
+        await redis.hdel(BATCH_ATTEMPTS_KEY, *give_up)
+        logger.error("Gave up on %d messages after %d batch attempts: %s", len(give_up), settings.ai_batch_max_attempts, give_up)
+
+
+# Run the async processing in a fresh event loop to avoid conflicts
+# with Celery's process lifecycle and Windows event loop policy issues.
+def _run_coro_on_new_loop(coro):
+    import asyncio, sys
+
+    # On Windows, asyncpg/sqlalchemy async sometimes requires the
+    # SelectorEventLoopPolicy; set it if available.
+    if sys.platform.startswith("win"):
+        policy_cls = getattr(asyncio, "WindowsSelectorEventLoopPolicy", None)
+        if policy_cls is not None:
             try:
-                asyncio.set_event_loop(None)
+                asyncio.set_event_loop_policy(policy_cls())
             except Exception:
                 pass
 
-    _run_coro_on_new_loop(_process())
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        from app.core.redis_client import close_redis
+
+        # the loop's redis client (and its sockets) would otherwise outlive the loop
+        try:
+            loop.run_until_complete(close_redis())
+        except Exception:
+            pass
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        except Exception:
+            pass
+        loop.close()
+        try:
+            asyncio.set_event_loop(None)
+        except Exception:
+            pass
@@ -12,11 +12,15 @@ if str(repo_root) not in sys.path:
     sys.path.insert(0, str(repo_root))
 os.chdir(repo_root)
 
+from sqlalchemy import text
+
 from app.db.models import Base
 from app.db.session import engine
 
 async def create():
     async with engine.begin() as conn:
+        # trigram operator class used by the sender-name search index
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
 
 if __name__ == "__main__":
@@ -14,12 +14,32 @@ if str(repo_root) not in sys.path:
 # `scripts/` or other subdirectories.
 os.chdir(repo_root)
 
+from sqlalchemy import text
+
 from app.db.models import Base
 from app.db.session import engine
 
+def _create_missing_indexes(sync_conn):
+    # create_all() only creates indexes together with new tables; add any that
+    # were introduced later to tables that already exist.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
 async def create():
     async with engine.begin() as conn:
+        # trigram operator class used by the sender-name search index
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
+        # generated search column for tables created before it existed (rewrites the table once)
+        await conn.execute(text(
+            "ALTER TABLE normalized_messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED"
+        ))
+        await conn.execute(text("ALTER TABLE normalized_messages ADD COLUMN IF NOT EXISTS ai_skip_reason varchar"))
+        # superseded by ix_normalized_messages_ai_skipped_created_at
+        await conn.execute(text("DROP INDEX IF EXISTS ix_normalized_messages_unprocessed_created_at"))
+        await conn.run_sync(_create_missing_indexes)
 
 if __name__ == "__main__":
     asyncio.run(create())
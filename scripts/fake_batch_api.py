@@ -0,0 +1,230 @@
+# scripts/fake_batch_api.py
+"""
+Local fake of the OpenAI Batch API (/files, /batches, /files/{id}/content), and
+a check of submit_suggestion_batch / fetch_suggestion_batch
+(app/services/ai_service.py) against it.
+
+    python scripts/fake_batch_api.py check [--port 8082]
+    python scripts/fake_batch_api.py serve [--port 8082] [--polls 2]
+
+check  starts the fake in-process and points OPENAI_API_BASE at it (no database
+       or Redis needed):
+         1. the multipart /files upload carries purpose=batch and one
+            chat/completions request per message, keyed nm-<message id>;
+         2. polling a batch that is still running returns its status and no
+            results;
+         3. once completed, the output file is parsed into suggestions per
+            message id, and a request that failed upstream is left out.
+serve  only runs the fake, for manual runs against the worker:
+       OPENAI_API_BASE=http://127.0.0.1:8082/v1 celery -A app.tasks.celery_app.celery worker --loglevel=info --pool=solo
+
+A batch reports validating, then in_progress, then completed after `--polls`
+status requests. Every request completes with three suggestions, except those
+whose prompt contains "fail", which get a 500 response row like a real
+per-request failure.
+"""
+import argparse
+import asyncio
+import email.parser
+import email.policy
+import json
+import os
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path and working directory is the repo root so
+# absolute imports and .env loading work when running this script from
+# `scripts/` or other subfolders.
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+os.chdir(repo_root)
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+def _parse_multipart(content_type: str, body: bytes) -> dict:
+    """name -> (filename or None, bytes) for a multipart/form-data body."""
+    msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+    )
+    if not msg.is_multipart():
+        raise ValueError("expected a multipart body")
+    parts = {}
+    for part in msg.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        parts[name] = (part.get_filename(), part.get_payload(decode=True))
+    return parts
+
+
+def _completion(request: dict) -> dict:
+    prompt = request["body"]["messages"][-1]["content"]
+    if "fail" in prompt:
+        return {"status_code": 500, "body": {"error": {"message": "fake upstream failure", "type": "server_error"}}}
+    n = len(prompt)
+    return {"status_code": 200, "body": {
+        "object": "chat.completion",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": f"Direct {n}\nFriendly {n}\nProfessional {n}"}}],
+    }}
+
+
+def expected_suggestions(prompt: str) -> list:
+    n = len(prompt)
+    return [f"Direct {n}", f"Friendly {n}", f"Professional {n}"]
+
+
+class FakeBatchAPI:
+    def __init__(self, polls_to_complete: int = 2):
+        self.polls_to_complete = polls_to_complete
+        self.files = {}    # file id -> {"purpose", "filename", "content"}
+        self.batches = {}  # batch id -> batch object (+ "_polls")
+        self.uploads = []  # parsed request lines of every purpose=batch upload, in order
+
+    def _new_file(self, purpose: str, filename: str, content: bytes) -> dict:
+        file_id = f"file-fake{len(self.files) + 1}"
+        self.files[file_id] = {"purpose": purpose, "filename": filename, "content": content}
+        return {"id": file_id, "object": "file", "bytes": len(content), "filename": filename, "purpose": purpose}
+
+    async def upload_file(self, request):
+        try:
+            parts = _parse_multipart(request.headers.get("content-type", ""), await request.body())
+            purpose = parts["purpose"][1].decode()
+            filename, content = parts["file"]
+        except (KeyError, ValueError) as exc:
+            return JSONResponse({"error": {"message": f"bad upload: {exc}"}}, status_code=400)
+        if purpose != "batch":
+            return JSONResponse({"error": {"message": f"unexpected purpose {purpose!r}"}}, status_code=400)
+        try:
+            lines = [json.loads(line) for line in content.decode("utf-8").splitlines() if line.strip()]
+        except ValueError as exc:
+            return JSONResponse({"error": {"message": f"invalid JSONL: {exc}"}}, status_code=400)
+        for line in lines:
+            if not line.get("custom_id") or line.get("method") != "POST" or "body" not in line:
+                return JSONResponse({"error": {"message": f"invalid batch request line: {line}"}}, status_code=400)
+        self.uploads.append(lines)
+        return JSONResponse(self._new_file(purpose, filename, content))
+
+    async def create_batch(self, request):
+        params = await request.json()
+        input_file = self.files.get(params.get("input_file_id"))
+        if input_file is None:
+            return JSONResponse({"error": {"message": "unknown input_file_id"}}, status_code=404)
+        if params.get("endpoint") != "/v1/chat/completions" or not params.get("completion_window"):
+            return JSONResponse({"error": {"message": f"bad batch params {params}"}}, status_code=400)
+        batch_id = f"batch_fake{len(self.batches) + 1}"
+        self.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": params["endpoint"],
+            "input_file_id": params["input_file_id"], "completion_window": params["completion_window"],
+            "status": "validating", "output_file_id": None, "_polls": 0,
+        }
+        return JSONResponse(self._public(self.batches[batch_id]))
+
+    async def get_batch(self, request):
+        batch = self.batches.get(request.path_params["batch_id"])
+        if batch is None:
+            return JSONResponse({"error": {"message": "unknown batch"}}, status_code=404)
+        batch["_polls"] += 1
+        if batch["status"] != "completed":
+            if batch["_polls"] >= self.polls_to_complete:
+                self._complete(batch)
+            else:
+                batch["status"] = "in_progress"
+        return JSONResponse(self._public(batch))
+
+    async def file_content(self, request):
+        f = self.files.get(request.path_params["file_id"])
+        if f is None:
+            return JSONResponse({"error": {"message": "unknown file"}}, status_code=404)
+        return Response(f["content"], media_type="application/jsonl")
+
+    def _complete(self, batch: dict):
+        requests = [json.loads(line) for line in self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines() if line.strip()]
+        rows = [
+            {"id": f"req-{i}", "custom_id": r["custom_id"], "response": _completion(r), "error": None}
+            for i, r in enumerate(requests)
+        ]
+        content = "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+        batch["output_file_id"] = self._new_file("batch_output", f"{batch['id']}_output.jsonl", content)["id"]
+        batch["status"] = "completed"
+
+    @staticmethod
+    def _public(batch: dict) -> dict:
+        return {k: v for k, v in batch.items() if not k.startswith("_")}
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/v1/files", self.upload_file, methods=["POST"]),
+            Route("/v1/files/{file_id}/content", self.file_content, methods=["GET"]),
+            Route("/v1/batches", self.create_batch, methods=["POST"]),
+            Route("/v1/batches/{batch_id}", self.get_batch, methods=["GET"]),
+        ])
+
+
+async def _start(fake: FakeBatchAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(fake.app(), host="127.0.0.1", port=port, log_level="warning"))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server
+
+
+async def check(port: int):
+    # must be set before app modules read settings
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    from app.db.models import NormalizedMessage
+    from app.services.ai_service import build_prompt, fetch_suggestion_batch, submit_suggestion_batch
+
+    fake = FakeBatchAPI(polls_to_complete=2)
+    server = await _start(fake, port)
+    # transient rows: the batch helpers only read id, text and sender_name
+    messages = [
+        NormalizedMessage(id=101, text="Are we still on for Friday?", sender_name="Ann"),
+        NormalizedMessage(id=102, text="Can you send the invoice again?", sender_name="Bob"),
+        NormalizedMessage(id=103, text="this one should fail upstream", sender_name="Eve"),
+    ]
+    try:
+        # 1: multipart upload + batch creation
+        batch_id = await submit_suggestion_batch(messages)
+        assert batch_id in fake.batches, f"unknown batch id {batch_id}"
+        assert len(fake.uploads) == 1, f"expected one upload, got {len(fake.uploads)}"
+        custom_ids = [line["custom_id"] for line in fake.uploads[0]]
+        assert custom_ids == ["nm-101", "nm-102", "nm-103"], f"unexpected custom_ids {custom_ids}"
+        print(f"ok: uploaded {len(custom_ids)} requests as a purpose=batch file; batch {batch_id} created")
+
+        # 2: still running
+        status, results = await fetch_suggestion_batch(batch_id)
+        assert status == "in_progress" and results == {}, f"expected in_progress without results, got {status} {results}"
+        print("ok: running batch reported in_progress with no results")
+
+        # 3: completed, output parsed, failed request skipped
+        status, results = await fetch_suggestion_batch(batch_id)
+        assert status == "completed", f"expected completed, got {status}"
+        expected = {
+            m.id: expected_suggestions(build_prompt({"text": m.text, "sender_name": m.sender_name}))
+            for m in messages[:2]
+        }
+        assert results == expected, f"unexpected results {results}, expected {expected}"
+        print(f"ok: completed batch parsed into suggestions for {sorted(results)}; failed request 103 skipped")
+    finally:
+        server.should_exit = True
+
+
+async def serve(port: int, polls: int):
+    server = uvicorn.Server(uvicorn.Config(FakeBatchAPI(polls_to_complete=polls).app(), host="127.0.0.1", port=port))
+    await server.serve()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI Batch API for Batch lane checks")
+    parser.add_argument("mode", choices=["check", "serve"])
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--polls", type=int, default=2, help="serve: status requests until a batch completes")
+    args = parser.parse_args()
+    if args.mode == "check":
+        asyncio.run(check(args.port))
+    else:
+        asyncio.run(serve(args.port, args.polls))
@@ -0,0 +1,204 @@
+# scripts/fake_bot_api.py
+"""
+Local fake of the Telegram Bot API getUpdates endpoint, and an end-to-end check
+of the long-polling ingest (app/connectors/telegram/poller.py) against it.
+
+    python scripts/fake_bot_api.py check [--port 8081]
+    python scripts/fake_bot_api.py serve [--port 8081] [--updates 20]
+
+check  starts the fake in-process, points TELEGRAM_API_BASE at it and runs the
+       poller against the dev Postgres/Redis from .env:
+         1. a batch with a malformed update is stored and the offset advances
+            past it;
+         2. a crash between storing a batch and checkpointing its offset makes
+            the poller refetch the same offset, and dedup stores every message
+            once;
+         3. a restarted poller resumes from the checkpointed offset.
+       The default bot's offset key is saved and restored around the run.
+serve  only runs the fake with `--updates` queued messages, for manual runs:
+       TELEGRAM_API_BASE=http://127.0.0.1:8081 python -m app.connectors.telegram.poller
+
+Like the real API, getUpdates returns updates with update_id >= offset, so an
+update counts as confirmed only once a later request passes its id.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path and working directory is the repo root so
+# absolute imports and .env loading work when running this script from
+# `scripts/` or other subfolders.
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+os.chdir(repo_root)
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class FakeBotAPI:
+    def __init__(self):
+        self.updates = []
+        self.offsets = []  # offset of every getUpdates call, in order
+        self._next_update_id = random.randint(10_000, 10_000_000)
+        self._next_message_id = random.randint(1, 1_000_000)
+        self.chat_id = random.randint(10**9, 2 * 10**9)
+
+    def add_messages(self, n: int):
+        for _ in range(n):
+            self.updates.append({
+                "update_id": self._next_update_id,
+                "message": {
+                    "message_id": self._next_message_id,
+                    "from": {"id": self.chat_id, "is_bot": False, "first_name": "Fake"},
+                    "chat": {"id": self.chat_id, "type": "private"},
+                    "text": f"fake message {self._next_message_id}",
+                },
+            })
+            self._next_update_id += 1
+            self._next_message_id += 1
+
+    def add_malformed(self):
+        self.updates.append({"update_id": self._next_update_id, "message": "not an object"})
+        self._next_update_id += 1
+
+    @property
+    def last_update_id(self) -> int:
+        return self.updates[-1]["update_id"]
+
+    async def _method(self, request):
+        method = request.path_params["method"]
+        if method == "deleteWebhook":
+            return JSONResponse({"ok": True, "result": True})
+        if method != "getUpdates":
+            return JSONResponse({"ok": False, "description": f"fake has no {method}"}, status_code=404)
+        params = await request.json()
+        offset = params.get("offset")
+        self.offsets.append(offset)
+        pending = [u for u in self.updates if offset is None or u["update_id"] >= offset]
+        pending = pending[:params.get("limit", 100)]
+        if not pending:
+            # long poll: hold the request (capped so checks stay fast)
+            await asyncio.sleep(min(params.get("timeout", 0), 1))
+        return JSONResponse({"ok": True, "result": pending})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[Route("/bot{token}/{method}", self._method, methods=["GET", "POST"])])
+
+
+async def _start(fake: FakeBotAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(fake.app(), host="127.0.0.1", port=port, log_level="warning"))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server
+
+
+async def _wait_for(predicate, timeout: float, what: str):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError(f"timed out waiting for {what}")
+        await asyncio.sleep(0.1)
+
+
+async def check(port: int):
+    # must be set before app modules read settings
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{port}"
+    os.environ["TELEGRAM_POLL_TIMEOUT"] = "1"
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "fake-token")
+    from sqlalchemy import func, select
+    from app.db.models import NormalizedMessage
+    from app.db.session import async_session
+    from app.connectors.telegram import poller
+
+    fake = FakeBotAPI()
+    server = await _start(fake, port)
+    saved_offset = await poller.load_offset(None)
+    await poller.get_redis().delete(poller._offset_key(None))
+
+    real_save = poller.save_offset
+    crashes = {"left": 1}
+
+    async def crashing_save(bot_id, offset):
+        # simulate dying after the batch was stored but before the checkpoint
+        if crashes["left"]:
+            crashes["left"] -= 1
+            raise RuntimeError("injected crash before offset checkpoint")
+        await real_save(bot_id, offset)
+
+    async def stored_count() -> int:
+        async with async_session() as session:
+            return (await session.execute(select(func.count()).where(
+                NormalizedMessage.platform == "telegram",
+                NormalizedMessage.platform_thread_id == str(fake.chat_id),
+            ))).scalar()
+
+    async def run_poller_until(offset: int):
+        stop = asyncio.Event()
+        task = asyncio.create_task(poller.poll(None, stop=stop))
+
+        async def reached():
+            if task.done():
+                task.result()  # surface a poller crash
+            return await poller.load_offset(None) == offset
+
+        try:
+            await _wait_for(reached, 30, f"offset {offset}")
+        finally:
+            stop.set()
+            await asyncio.wait_for(task, 10)
+
+    try:
+        # 1 + 2: first batch (with a poison update), crash before the checkpoint, redelivery
+        fake.add_messages(5)
+        fake.add_malformed()
+        fake.add_messages(4)
+        first_offset = fake.updates[0]["update_id"]
+        poller.save_offset = crashing_save
+        await run_poller_until(fake.last_update_id + 1)
+        assert fake.offsets.count(None) >= 2, f"batch was not refetched after the crash: {fake.offsets}"
+        assert await stored_count() == 9, f"expected 9 stored messages, got {await stored_count()}"
+        print("ok: crash before checkpoint refetched the batch; 9 messages stored once, poison update skipped")
+
+        # 3: restart resumes from the checkpoint
+        resume_from = fake.last_update_id + 1
+        calls_before = len(fake.offsets)
+        fake.add_messages(3)
+        await run_poller_until(fake.last_update_id + 1)
+        assert fake.offsets[calls_before] == resume_from, f"restart polled from {fake.offsets[calls_before]}, expected {resume_from}"
+        assert await stored_count() == 12, f"expected 12 stored messages, got {await stored_count()}"
+        print(f"ok: restarted poller resumed from offset {resume_from}; 12 messages stored")
+        print(f"offsets requested: {fake.offsets} (first update_id {first_offset})")
+    finally:
+        poller.save_offset = real_save
+        if saved_offset is not None:
+            await real_save(None, saved_offset)
+        else:
+            await poller.get_redis().delete(poller._offset_key(None))
+        server.should_exit = True
+
+
+async def serve(port: int, n: int):
+    fake = FakeBotAPI()
+    fake.add_messages(n)
+    server = uvicorn.Server(uvicorn.Config(fake.app(), host="127.0.0.1", port=port))
+    await server.serve()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API for poller checks")
+    parser.add_argument("mode", choices=["check", "serve"])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--updates", type=int, default=20, help="serve: messages queued at start")
+    args = parser.parse_args()
+    if args.mode == "check":
+        asyncio.run(check(args.port))
+    else:
+        asyncio.run(serve(args.port, args.updates))
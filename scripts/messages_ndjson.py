@@ -0,0 +1,181 @@
+# scripts/messages_ndjson.py
+"""
+Stream normalized_messages to/from NDJSON (one JSON object per line).
+
+    python scripts/messages_ndjson.py export out.ndjson [--since 2025-01-01] [--platform telegram] [--cursor]
+    python scripts/messages_ndjson.py replay in.ndjson [--rate 200] [--batch 100] [--queue nexa_backlog]
+    python scripts/messages_ndjson.py restore in.ndjson [--batch 5000]
+
+export   COPY (SELECT row_to_json(...)) TO STDOUT straight into the file; --cursor
+         uses a server-side cursor instead (e.g. behind pgbouncer). Memory stays flat.
+replay   re-ingests rows through the connector pipeline (app/connectors/pipeline.py)
+         at most --rate messages per second: dedup, backpressure admission and
+         the task outbox apply as for live traffic, so rows already stored are
+         skipped and new ones get new ids and created_at = now. For load tests,
+         or with --queue set to an AI_BATCH_QUEUES queue for Batch API backfills.
+restore  raw bulk load with COPY FROM, keeping ids and flags, then bumps the id
+         sequence. For restoring a dump into an empty table.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path and working directory is the repo root so
+# absolute imports and .env loading work when running this script from
+# `scripts/` or other subfolders.
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+os.chdir(repo_root)
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.connectors.pipeline import store_messages
+from app.db.models import NormalizedMessage
+from app.db.session import engine, async_session
+
+TABLE = NormalizedMessage.__table__
+# generated columns cannot be written
+COLUMNS = [c.name for c in TABLE.columns if c.computed is None]
+# COPY FROM takes JSONB values as JSON text
+JSONB_COLUMNS = [c.name for c in TABLE.columns if isinstance(c.type, JSONB) and c.computed is None]
+# CSV with control characters as quote/delimiter: row_to_json never emits them raw
+# (JSON escapes them), so each row comes out as the bare JSON text plus newline.
+_COPY_OPTS = {"format": "csv", "quote": "\x01", "delimiter": "\x02"}
+
+
+def _filters(args):
+    """WHERE clauses as asyncpg $n placeholders plus their values."""
+    clauses, values = [], []
+    if args.since:
+        values.append(datetime.datetime.fromisoformat(args.since))
+        clauses.append(f"created_at >= ${len(values)}")
+    if args.platform:
+        values.append(args.platform)
+        clauses.append(f"platform = ${len(values)}")
+    return clauses, values
+
+
+async def export(args):
+    count = 0
+    # binary: COPY chunks can split a multi-byte character
+    with open(args.path, "wb") as fh:
+        async with engine.connect() as conn:
+            if args.cursor:
+                stmt = select(*[TABLE.c[c] for c in COLUMNS]).order_by(TABLE.c.id)
+                if args.since:
+                    stmt = stmt.where(TABLE.c.created_at >= datetime.datetime.fromisoformat(args.since))
+                if args.platform:
+                    stmt = stmt.where(TABLE.c.platform == args.platform)
+                result = await conn.stream(stmt.execution_options(yield_per=args.batch))
+                async for row in result:
+                    fh.write((json.dumps(dict(row._mapping), default=str) + "\n").encode("utf-8"))
+                    count += 1
+            else:
+                clauses, values = _filters(args)
+                where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+                query = f"SELECT row_to_json(t) FROM (SELECT {', '.join(COLUMNS)} FROM {TABLE.name} {where} ORDER BY id) t"
+                raw = await conn.get_raw_connection()
+
+                async def _write(chunk: bytes):
+                    fh.write(chunk)
+
+                status = await raw.driver_connection.copy_from_query(query, *values, output=_write, **_COPY_OPTS)
+                count = int(status.split()[-1])
+    print(f"exported {count} rows to {args.path}")
+
+
+def _read_batches(path: str, size: int):
+    batch = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                batch.append(json.loads(line))
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+# what a connector hands to store_messages
+_REPLAY_FIELDS = ("platform_thread_id", "platform_message_id", "sender_id", "sender_name", "text", "raw_payload")
+
+
+def _coerce(rec: dict) -> dict:
+    if isinstance(rec.get("created_at"), str):
+        rec["created_at"] = datetime.datetime.fromisoformat(rec["created_at"])
+    return rec
+
+
+async def replay(args):
+    interval = args.batch / args.rate if args.rate else 0.0
+    total = stored = 0
+    for batch in _read_batches(args.path, args.batch):
+        started = time.monotonic()
+        # the ingest pipeline stores per (platform, bot); keep file order within each group
+        groups = {}
+        for rec in batch:
+            groups.setdefault((rec.get("platform") or "unknown", rec.get("bot_id")), []).append(rec)
+        for (platform, bot_id), recs in groups.items():
+            # id, created_at, processed, suggestions and ai_skip_reason are set afresh on insert
+            items = [{k: rec.get(k) for k in _REPLAY_FIELDS} for rec in recs]
+            stored += len(await store_messages(platform, items, bot_id=bot_id, queue=args.queue))
+        total += len(batch)
+        # pace batches so the pipeline sees at most --rate messages per second
+        elapsed = time.monotonic() - started
+        if interval > elapsed:
+            await asyncio.sleep(interval - elapsed)
+    print(f"replayed {total} messages from {args.path} ({stored} stored, {total - stored} already present)")
+
+
+async def restore(args):
+    total = 0
+    async with engine.begin() as conn:
+        raw = await conn.get_raw_connection()
+        apg = raw.driver_connection
+        for batch in _read_batches(args.path, args.batch):
+            records = []
+            for rec in batch:
+                rec = _coerce(rec)
+                for c in JSONB_COLUMNS:
+                    if rec.get(c) is not None:
+                        rec[c] = json.dumps(rec[c])
+                records.append(tuple(rec.get(c) for c in COLUMNS))
+            await apg.copy_records_to_table(TABLE.name, records=records, columns=COLUMNS)
+            total += len(records)
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE.name}', 'id'), COALESCE(MAX(id), 1)) FROM {TABLE.name}"
+        ))
+    print(f"restored {total} rows from {args.path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("export")
+    p.add_argument("path")
+    p.add_argument("--since", default=None, help="ISO timestamp lower bound on created_at")
+    p.add_argument("--platform", default=None)
+    p.add_argument("--cursor", action="store_true", help="server-side cursor instead of COPY")
+    p.add_argument("--batch", type=int, default=1000, help="rows per cursor fetch")
+
+    p = sub.add_parser("replay")
+    p.add_argument("path")
+    p.add_argument("--rate", type=float, default=100.0, help="messages per second (0 = unthrottled)")
+    p.add_argument("--batch", type=int, default=100)
+    p.add_argument("--queue", default=None, help="Celery queue (default nexa_default)")
+
+    p = sub.add_parser("restore")
+    p.add_argument("path")
+    p.add_argument("--batch", type=int, default=5000)
+
+    args = parser.parse_args()
+    asyncio.run({"export": export, "replay": replay, "restore": restore}[args.cmd](args))
@@ -0,0 +1,69 @@
+# scripts/register_bot.py
+"""
+Register a Telegram bot in `telegram_bots` and point its webhook at
+{WEBHOOK_BASE_URL}/connectors/telegram/{bot_id}/webhook.
+
+    python scripts/register_bot.py <name> <token> [--queue nexa_bot_big] [--rate 20]
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path and working directory is the repo root so
+# absolute imports and .env loading work when running this script from
+# `scripts/` or other subfolders.
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+os.chdir(repo_root)
+
+import httpx
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.connectors.telegram.sender import TELEGRAM_BASE
+from app.db.models import TelegramBot
+from app.db.session import async_session
+
+
+async def register(name: str, token: str, queue: str | None, rate: float | None):
+    async with async_session() as session:
+        q = await session.execute(select(TelegramBot).where(TelegramBot.name == name))
+        bot = q.scalars().first()
+        if bot is None:
+            bot = TelegramBot(name=name)
+            session.add(bot)
+        bot.token = token
+        bot.webhook_secret = bot.webhook_secret or secrets.token_urlsafe(32)
+        bot.celery_queue = queue
+        bot.rate_limit_per_sec = rate
+        bot.active = True
+        await session.commit()
+        await session.refresh(bot)
+
+    print(f"bot {name!r} registered with id={bot.id}")
+    if not settings.webhook_base_url:
+        print("WEBHOOK_BASE_URL not set; skipping setWebhook.")
+        return
+
+    url = f"{settings.webhook_base_url.rstrip('/')}/connectors/telegram/{bot.id}/webhook"
+    async with httpx.AsyncClient(timeout=20.0) as client:
+        resp = await client.post(
+            f"{TELEGRAM_BASE}/bot{token}/setWebhook",
+            json={"url": url, "secret_token": bot.webhook_secret},
+        )
+        resp.raise_for_status()
+    print(f"webhook set to {url}: {resp.json()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("name")
+    parser.add_argument("token")
+    parser.add_argument("--queue", default=None, help="dedicated Celery queue for this bot")
+    parser.add_argument("--rate", type=float, default=None, help="outbound messages per second")
+    args = parser.parse_args()
+    asyncio.run(register(args.name, args.token, args.queue, args.rate))
@@ -3,9 +3,13 @@ import os
 import sys
 import json
 import logging
-import requests
 import asyncio
-from telethon import TelegramClient, events
+import argparse
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import aiohttp
+from telethon import TelegramClient, events, utils
 from telethon.errors import SessionPasswordNeededError
 from aiohttp import web
 
@@ -17,83 +21,372 @@ logger = logging.getLogger("userbot")
 API_ID = int(os.environ.get("TG_API_ID", "0"))
 API_HASH = os.environ.get("TG_API_HASH", "")
 PHONE = os.environ.get("TG_PHONE", "")  # only needed first-run
-BACKEND_WEBHOOK = os.environ.get("BACKEND_WEBHOOK", "http://127.0.0.1:8000/connectors/personal/webhook")
+BACKEND_WEBHOOK = os.environ.get("BACKEND_WEBHOOK", "http://127.0.0.1:8000/webhook/personal")
+# Endpoint for {"updates": [...]} batches; defaults to BACKEND_WEBHOOK (/webhook/{platform} accepts both shapes)
+BACKEND_BATCH_WEBHOOK = os.environ.get("BACKEND_BATCH_WEBHOOK", "") or BACKEND_WEBHOOK
+# Set to 1 for backends that only take one update per request
+FORWARD_UNBATCHED = os.environ.get("USERBOT_FORWARD_UNBATCHED", "0") == "1"
 SESSION_NAME = os.environ.get("TG_SESSION", "user_session")
+# JSON list of accounts: [{"account_id": "alice", "session": "sessions/alice", "api_id": ..., "api_hash": ..., "phone": ...}]
+# api_id/api_hash/phone fall back to the TG_* values above. Unset = one account "default" using TG_SESSION.
+ACCOUNTS_FILE = os.environ.get("USERBOT_ACCOUNTS_FILE", "")
 # HTTP server config for inbound reply requests (from your backend)
 HTTP_HOST = os.environ.get("USERBOT_HTTP_HOST", "127.0.0.1")
 HTTP_PORT = int(os.environ.get("USERBOT_HTTP_PORT", "9000"))
 # Shared secret header to authorize backend -> userbot calls
 INCOMING_SECRET = os.environ.get("USERBOT_SECRET", "change-me-to-a-strong-secret")
+# Forwarding batch limits shared by all accounts in this process
+FORWARD_BATCH_SIZE = int(os.environ.get("USERBOT_FORWARD_BATCH_SIZE", "50"))
+FORWARD_BATCH_WAIT = float(os.environ.get("USERBOT_FORWARD_BATCH_WAIT", "0.05"))
+FORWARD_CONCURRENCY = int(os.environ.get("USERBOT_FORWARD_CONCURRENCY", "20"))
+# Max payloads waiting to be forwarded; when full, handlers wait (bounds memory during a backend outage)
+FORWARD_QUEUE_MAX = int(os.environ.get("USERBOT_FORWARD_QUEUE_MAX", "10000"))
+# Longest single wait honoured from a backend 429's Retry-After
+FORWARD_MAX_RETRY_AFTER = float(os.environ.get("USERBOT_FORWARD_MAX_RETRY_AFTER", "60"))
+# Sender entity cache (see EntityCache)
+ENTITY_CACHE_FILE = os.environ.get("USERBOT_ENTITY_CACHE_FILE", "userbot_entities.json")
+ENTITY_CACHE_SIZE = int(os.environ.get("USERBOT_ENTITY_CACHE_SIZE", "100000"))
+ENTITY_CACHE_TTL = float(os.environ.get("USERBOT_ENTITY_CACHE_TTL", "86400"))
+ENTITY_CACHE_FLUSH_INTERVAL = float(os.environ.get("USERBOT_ENTITY_CACHE_FLUSH_INTERVAL", "60"))
 
 if not API_ID or not API_HASH:
     logger.error("TG_API_ID and TG_API_HASH must be set in environment.")
     sys.exit(1)
 
-client = TelegramClient(SESSION_NAME, API_ID, API_HASH)
 
-# Helper: forward to backend (when receiving personal messages)
-def forward_to_backend(payload: dict, max_retries: int = 3):
-    headers = {"Content-Type": "application/json"}
-    for attempt in range(1, max_retries + 1):
-        try:
-            r = requests.post(BACKEND_WEBHOOK, json=payload, headers=headers, timeout=10)
-            r.raise_for_status()
-            logger.info("Forwarded message id=%s -> backend (status=%s)", payload.get("message_id"), r.status_code)
-            return True
-        except Exception as exc:
-            logger.warning("Failed to forward (attempt %s/%s): %s", attempt, max_retries, exc)
-            if attempt < max_retries:
-                import time; time.sleep(1.5 * attempt)
+def load_accounts(shard: int = 0, shards: int = 1) -> List[dict]:
+    """Accounts served by this process; with --shard i/n every n-th account from index i."""
+    if ACCOUNTS_FILE:
+        with open(ACCOUNTS_FILE, encoding="utf-8") as fh:
+            accounts = json.load(fh)
+    else:
+        accounts = [{"account_id": "default", "session": SESSION_NAME, "phone": PHONE}]
+    return [a for i, a in enumerate(accounts) if i % shards == shard]
+
+
+# -----------------------
+# shared, batched forwarding to backend
+# -----------------------
+class Forwarder:
+    """
+    One queue and one HTTP connection pool for every account in the process.
+    Payloads are drained in batches of up to FORWARD_BATCH_SIZE (or whatever
+    arrived within FORWARD_BATCH_WAIT) so Telethon handlers never block on HTTP.
+    The queue holds at most FORWARD_QUEUE_MAX payloads; beyond that submit()
+    waits, pushing back on the Telethon handlers instead of growing memory.
+    A 429 from the backend (backpressure at the reject level) is retried after
+    its Retry-After for as long as it lasts, so those messages are delayed, not lost.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=FORWARD_QUEUE_MAX)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=10),
+            connector=aiohttp.TCPConnector(limit=FORWARD_CONCURRENCY),
+            # the backend checks the same shared secret on /webhook/personal
+            headers={"X-USERBOT-SECRET": INCOMING_SECRET},
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self.session:
+            await self.session.close()
+
+    async def submit(self, payload: dict):
+        if self.queue.full():
+            logger.warning("Forward queue full (%d); waiting for the backend", FORWARD_QUEUE_MAX)
+        await self.queue.put(payload)
+
+    async def _next_batch(self) -> List[dict]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + FORWARD_BATCH_WAIT
+        while len(batch) < FORWARD_BATCH_SIZE:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if FORWARD_UNBATCHED:
+                await asyncio.gather(*(self._post(BACKEND_WEBHOOK, p, 1) for p in batch))
             else:
-                logger.error("Giving up forwarding message id=%s", payload.get("message_id"))
-                return False
+                await self._post(BACKEND_BATCH_WEBHOOK, {"updates": batch}, len(batch))
+
+    async def _post(self, url: str, body: dict, count: int, max_retries: int = 3) -> bool:
+        attempt = 0
+        while True:
+            try:
+                async with self.session.post(url, json=body) as r:
+                    retry_after = _retry_after(r.headers.get("Retry-After")) if r.status == 429 else None
+                    if retry_after is None:
+                        r.raise_for_status()
+                if retry_after is None:
+                    logger.info("Forwarded %d message(s) -> backend (status=%s)", count, r.status)
+                    return True
+            except Exception as exc:
+                attempt += 1
+                logger.warning("Failed to forward (attempt %s/%s): %s", attempt, max_retries, exc)
+                if attempt >= max_retries:
+                    break
+                await asyncio.sleep(1.5 * attempt)
+                continue
+            # the backend is shedding load: hold this batch (and, once the queue fills,
+            # the handlers behind it) until it asks again; this doesn't count as a failure
+            logger.warning("Backend busy (429); retrying %d message(s) in %.0fs", count, retry_after)
+            await asyncio.sleep(retry_after)
+        logger.error("Giving up forwarding %d message(s)", count)
+        return False
+
 
-@client.on(events.NewMessage(incoming=True))
-async def handler(event):
-    if event.out:
-        return
+def _retry_after(value: Optional[str]) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds form), capped at FORWARD_MAX_RETRY_AFTER."""
     try:
-        sender = await event.get_sender()
-        chat = await event.get_chat()
-    except Exception:
-        sender = None
-        chat = None
-
-    payload = {
-        "update_id": None,
-        "message": {
-            "message_id": event.message.id if event.message else None,
-            "from": {
-                "id": getattr(sender, "id", None),
-                "is_bot": getattr(sender, "bot", False) if sender else False,
-                "first_name": getattr(sender, "first_name", None),
-                "username": getattr(sender, "username", None),
-            },
-            "chat": {
-                "id": getattr(chat, "id", None) if chat else getattr(sender, "id", None),
-                "type": "private" if event.is_private else "group"
-            },
-            "date": int(event.message.date.timestamp()) if event.message and event.message.date else None,
-            "text": event.message.message if event.message else None,
-            "raw": event.message.to_json() if event.message else None
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = 1.0
+    return min(max(seconds, 1.0), FORWARD_MAX_RETRY_AFTER)
+
+
+forwarder = Forwarder()
+
+
+# -----------------------
+# sender entity cache
+# -----------------------
+class EntityCache:
+    """
+    Bounded LRU+TTL cache of the sender fields we forward, keyed by peer id.
+    User ids are global, so one cache serves every account in the process.
+    Filled from entities the update already carried (event.sender) and only falls
+    back to get_sender() -- an API round-trip and FloodWait risk -- on a miss.
+    Persisted to ENTITY_CACHE_FILE so restarts start warm.
+    """
+
+    def __init__(self, path: str, max_size: int, ttl: float):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        # peer_id -> (stored_at wall clock, fields)
+        self._data: "OrderedDict[int, tuple]" = OrderedDict()
+        self.stats = {"event_hits": 0, "cache_hits": 0, "fetches": 0, "fetch_errors": 0}
+
+    @staticmethod
+    def _fields(entity) -> dict:
+        return {
+            "id": getattr(entity, "id", None),
+            "is_bot": bool(getattr(entity, "bot", False)),
+            "first_name": getattr(entity, "first_name", None),
+            "username": getattr(entity, "username", None),
         }
-    }
 
-    logger.info("Received personal DM from %s: %r", payload["message"]["from"].get("username") or payload["message"]["from"].get("id"), (payload["message"]["text"] or "")[:120])
-    forward_to_backend(payload)
+    def get(self, peer_id: int) -> Optional[dict]:
+        item = self._data.get(peer_id)
+        if item is None:
+            return None
+        if time.time() - item[0] > self.ttl:
+            del self._data[peer_id]
+            return None
+        self._data.move_to_end(peer_id)
+        return item[1]
+
+    def put(self, peer_id: int, entity) -> dict:
+        fields = self._fields(entity)
+        if peer_id is None:
+            return fields
+        self._data[peer_id] = (time.time(), fields)
+        self._data.move_to_end(peer_id)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return fields
+
+    async def resolve_sender(self, event) -> Optional[dict]:
+        peer_id = event.sender_id
+        # the update usually ships the sender entity; refresh the cache from it for free
+        if event.sender is not None:
+            self.stats["event_hits"] += 1
+            return self.put(peer_id, event.sender)
+        if peer_id is not None:
+            cached = self.get(peer_id)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+        try:
+            sender = await event.get_sender()
+        except Exception:
+            self.stats["fetch_errors"] += 1
+            return None
+        self.stats["fetches"] += 1
+        if sender is None:
+            return None
+        return self.put(peer_id, sender)
+
+    def snapshot(self) -> dict:
+        total = sum(self.stats.values())
+        served = self.stats["event_hits"] + self.stats["cache_hits"]
+        return dict(self.stats, size=len(self._data), hit_ratio=round(served / total, 4) if total else None)
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                rows = json.load(fh)
+        except FileNotFoundError:
+            return
+        except Exception as exc:
+            logger.warning("Ignoring unreadable entity cache %s: %s", self.path, exc)
+            return
+        now = time.time()
+        for peer_id, stored_at, fields in rows[-self.max_size:]:
+            if now - stored_at <= self.ttl:
+                self._data[int(peer_id)] = (stored_at, fields)
+        logger.info("Loaded %d cached entities from %s", len(self._data), self.path)
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump([[k, v[0], v[1]] for k, v in self._data.items()], fh)
+        os.replace(tmp, self.path)
+
+    async def run_flusher(self):
+        while True:
+            await asyncio.sleep(ENTITY_CACHE_FLUSH_INTERVAL)
+            try:
+                self.save()
+            except Exception as exc:
+                logger.warning("Failed to persist entity cache: %s", exc)
+            logger.info("Entity cache: %s", self.snapshot())
+
+
+entity_cache = EntityCache(ENTITY_CACHE_FILE, ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+
+
+# -----------------------
+# per-account Telethon sessions
+# -----------------------
+class AccountSession:
+    """One Telethon client, supervised so it can be restarted without touching the others."""
+
+    def __init__(self, cfg: dict):
+        self.account_id = str(cfg["account_id"])
+        self.phone = cfg.get("phone") or None
+        self.client = TelegramClient(
+            cfg.get("session") or self.account_id,
+            int(cfg.get("api_id") or API_ID),
+            cfg.get("api_hash") or API_HASH,
+        )
+        self.client.add_event_handler(self.handler, events.NewMessage(incoming=True))
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.client.is_connected()
+
+    def start(self):
+        self._task = asyncio.create_task(self._supervise())
+
+    async def restart(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        await self.client.disconnect()
+        self.start()
+
+    async def _supervise(self):
+        backoff = 1.0
+        while True:
+            try:
+                await self.client.start(phone=self.phone)
+            except SessionPasswordNeededError:
+                logger.error("[%s] Two-step verification enabled. Please supply your password interactively.", self.account_id)
+                await self.client.disconnect()
+                return
+            except Exception as exc:
+                logger.warning("[%s] Failed to start session: %s — retrying in %.0fs", self.account_id, exc, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 300)
+                continue
+
+            me = await self.client.get_me()
+            logger.info("[%s] Userbot started as %s (id=%s)", self.account_id, getattr(me, "username", None), getattr(me, "id", None))
+            backoff = 1.0
+            try:
+                await self.client.run_until_disconnected()
+            except Exception as exc:
+                logger.warning("[%s] Session dropped: %s", self.account_id, exc)
+            logger.info("[%s] Disconnected; reconnecting", self.account_id)
+            await asyncio.sleep(backoff)
+
+    async def handler(self, event):
+        if event.out:
+            return
+        sender = await entity_cache.resolve_sender(event) or {}
+        # the chat id is derivable from the peer itself; no get_chat() round-trip needed
+        chat_id = utils.resolve_id(event.chat_id)[0] if event.chat_id is not None else sender.get("id")
+
+        payload = {
+            "update_id": None,
+            "account_id": self.account_id,
+            "message": {
+                "message_id": event.message.id if event.message else None,
+                "from": {
+                    "id": sender.get("id"),
+                    "is_bot": sender.get("is_bot", False),
+                    "first_name": sender.get("first_name"),
+                    "username": sender.get("username"),
+                },
+                "chat": {
+                    "id": chat_id,
+                    "type": "private" if event.is_private else "group"
+                },
+                "date": int(event.message.date.timestamp()) if event.message and event.message.date else None,
+                "text": event.message.message if event.message else None,
+                "raw": event.message.to_json() if event.message else None
+            }
+        }
+
+        logger.info("[%s] Received personal DM from %s: %r", self.account_id, payload["message"]["from"].get("username") or payload["message"]["from"].get("id"), (payload["message"]["text"] or "")[:120])
+        await forwarder.submit(payload)
+
+
+accounts: Dict[str, AccountSession] = {}
+
+
+def _authorized(request) -> bool:
+    secret = request.headers.get("X-USERBOT-SECRET", "")
+    return bool(secret) and secret == INCOMING_SECRET
+
+
+def _resolve_account(account_id) -> Optional[AccountSession]:
+    if account_id is None and len(accounts) == 1:
+        # single-account deployments keep the old request shape
+        return next(iter(accounts.values()))
+    return accounts.get(str(account_id)) if account_id is not None else None
+
 
 # -----------------------
 # aiohttp: /send_reply
 # -----------------------
 # This endpoint accepts POST JSON:
-# { "chat_id": "<chat id>", "text": "reply text" }
-# or alternatively:
-# { "message_id": <normalized_message_id>, "text": "reply text" }
+# { "account_id": "<account>", "chat_id": "<chat id>", "text": "reply text" }
+# account_id may be omitted when this process serves a single account.
 # The backend should supply header "X-USERBOT-SECRET: <secret>"
 async def send_reply_handler(request):
     # auth
-    secret = request.headers.get("X-USERBOT-SECRET", "")
-    if not secret or secret != INCOMING_SECRET:
+    if not _authorized(request):
         return web.json_response({"error": "unauthorized"}, status=401)
 
     try:
@@ -105,56 +398,95 @@ async def send_reply_handler(request):
     if not text:
         return web.json_response({"error": "text required"}, status=400)
 
+    account = _resolve_account(data.get("account_id"))
+    if account is None:
+        return web.json_response({"error": "unknown account_id"}, status=404)
+
     # Accept either chat_id directly, or a normalized_message_id that the userbot cannot resolve itself.
     chat_id = data.get("chat_id")
-    # Optional: allow sending to normalized_message's platform_thread_id if backend passes it instead.
     # If chat_id is numeric string, Telethon is happy with int or str.
     try:
         if not chat_id:
             return web.json_response({"error": "chat_id required"}, status=400)
 
         # Send message via Telethon
-        # client.send_message is a coroutine
-        await client.send_message(entity=chat_id, message=text)
-        logger.info("Sent reply to chat_id=%s text=%r", chat_id, text[:120])
+        await account.client.send_message(entity=chat_id, message=text)
+        logger.info("[%s] Sent reply to chat_id=%s text=%r", account.account_id, chat_id, text[:120])
         return web.json_response({"ok": True})
     except Exception as exc:
-        logger.exception("Failed to send reply via userbot")
+        logger.exception("[%s] Failed to send reply via userbot", account.account_id)
         return web.json_response({"error": str(exc)}, status=500)
 
+
+async def restart_handler(request):
+    if not _authorized(request):
+        return web.json_response({"error": "unauthorized"}, status=401)
+    account = accounts.get(request.match_info["account_id"])
+    if account is None:
+        return web.json_response({"error": "unknown account_id"}, status=404)
+    await account.restart()
+    return web.json_response({"ok": True, "account_id": account.account_id})
+
+
+async def accounts_handler(request):
+    if not _authorized(request):
+        return web.json_response({"error": "unauthorized"}, status=401)
+    return web.json_response({
+        "accounts": [{"account_id": a.account_id, "connected": a.connected} for a in accounts.values()],
+        "entity_cache": entity_cache.snapshot(),
+    })
+
+
 # A small web app runner that runs in same asyncio loop as Telethon
-async def start_webapp(app):
+async def start_webapp(app, port: int):
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, HTTP_HOST, HTTP_PORT)
+    site = web.TCPSite(runner, HTTP_HOST, port)
     await site.start()
-    logger.info("Userbot HTTP server listening on http://%s:%s", HTTP_HOST, HTTP_PORT)
+    logger.info("Userbot HTTP server listening on http://%s:%s", HTTP_HOST, port)
     return runner
 
-async def main():
-    # Start Telethon client
-    try:
-        await client.start(phone=PHONE if PHONE else None)
-    except SessionPasswordNeededError:
-        logger.error("Two-step verification enabled. Please supply your password interactively.")
-        await client.disconnect()
-        return
 
-    me = await client.get_me()
-    logger.info("Userbot started as %s (id=%s)", getattr(me, "username", None), getattr(me, "id", None))
+async def main(shard: int = 0, shards: int = 1):
+    await forwarder.start()
+    entity_cache.load()
+    flusher = asyncio.create_task(entity_cache.run_flusher())
+
+    # Start every Telethon session served by this shard
+    for cfg in load_accounts(shard, shards):
+        acct = AccountSession(cfg)
+        accounts[acct.account_id] = acct
+        acct.start()
+    logger.info("Shard %d/%d serving %d account(s)", shard, shards, len(accounts))
 
-    # Create aiohttp app and route
+    # Create aiohttp app and routes
     app = web.Application()
     app.router.add_post("/send_reply", send_reply_handler)
+    app.router.add_post("/accounts/{account_id}/restart", restart_handler)
+    app.router.add_get("/accounts", accounts_handler)
 
-    # Start the webapp in background (same event loop)
-    await start_webapp(app)
+    # Start the webapp in background (same event loop); each shard listens on its own port
+    runner = await start_webapp(app, HTTP_PORT + shard)
+
+    # Run until interrupted; sessions reconnect on their own
+    try:
+        await asyncio.Event().wait()
+    finally:
+        flusher.cancel()
+        entity_cache.save()
+        await runner.cleanup()
+        await forwarder.stop()
 
-    # Run until disconnected
-    await client.run_until_disconnected()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telethon userbot pool")
+    parser.add_argument("--shard", default="0/1", help="i/n: serve every n-th account starting at i (port = USERBOT_HTTP_PORT + i)")
+    args = parser.parse_args()
+    shard, shards = (int(x) for x in args.shard.split("/", 1))
+    if shards > 1 and "USERBOT_ENTITY_CACHE_FILE" not in os.environ:
+        # shards must not overwrite each other's cache file
+        entity_cache.path = f"userbot_entities.{shard}.json"
     try:
-        asyncio.run(main())
+        asyncio.run(main(shard, shards))
     except KeyboardInterrupt:
         logger.info("Exiting userbot.")